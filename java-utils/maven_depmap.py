@@ -44,7 +44,6 @@ import sys
 from os.path import basename, dirname
 import zipfile
 from time import gmtime, strftime
-from copy import deepcopy
 
 from javapackages.maven.pom import POM
 from javapackages.metadata.artifact import MetadataArtifact
@@ -52,6 +51,7 @@ from javapackages.metadata.alias import MetadataAlias
 from javapackages.metadata.metadata import Metadata
 
 from javapackages.common.exception import JavaPackagesToolsException
+from javapackages.common.util import read_batch
 
 
 class PackagingTypeMissingFile(JavaPackagesToolsException):
@@ -83,8 +83,64 @@ def _print_path_with_dirs(path, base):
         path = dirname(path)
 
 
-def _make_files_versioned(versions, pom_path, jar_path, pom_base, jar_base):
-    """Make pom and jar file versioned"""
+# ioctl request cloning file extents (reflink) on Linux
+FICLONE = 0x40049409
+
+
+def _reflink(src, dest):
+    """Create dest as copy-on-write clone of src, return number of bytes
+    which didn't need to be copied on success, None otherwise"""
+    try:
+        import fcntl
+        with open(src, 'rb') as src_file:
+            with open(dest, 'wb') as dest_file:
+                fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+        shutil.copymode(src, dest)
+    except (ImportError, IOError, OSError):
+        if os.path.exists(dest):
+            os.remove(dest)
+        return None
+    return os.path.getsize(dest)
+
+
+def _hardlink(src, dest):
+    """Create dest as hard link to src, return number of bytes which didn't
+    need to be copied on success, None otherwise"""
+    try:
+        if os.path.lexists(dest):
+            os.remove(dest)
+        os.link(src, dest)
+    except OSError:
+        return None
+    return os.path.getsize(dest)
+
+
+def _make_file_versioned(path, dest, copy_mode):
+    """Make dest a regular file with content of path which is going to be
+    removed. Regular files are just renamed, symlinks are resolved and their
+    target is cloned or linked according to copy_mode, or copied. Return
+    tuple (True if path was renamed, number of bytes which didn't need to be
+    copied)."""
+    if not os.path.islink(path):
+        os.rename(path, dest)
+        return True, os.path.getsize(dest)
+
+    src = os.path.realpath(path)
+    bytes_avoided = None
+    if copy_mode == "reflink":
+        bytes_avoided = _reflink(src, dest)
+    elif copy_mode == "hardlink":
+        bytes_avoided = _hardlink(src, dest)
+    if bytes_avoided is None:
+        shutil.copy(src, dest)
+        bytes_avoided = 0
+    return False, bytes_avoided
+
+
+def _make_files_versioned(versions, pom_path, jar_path, pom_base, jar_base,
+                          copy_mode="copy"):
+    """Make pom and jar file versioned, return tuple (versioned pom path,
+    versioned jar path, number of bytes which didn't need to be copied)"""
     versions = list(set(versions.split(',')))
 
     vpom_path = pom_path
@@ -92,15 +148,19 @@ def _make_files_versioned(versions, pom_path, jar_path, pom_base, jar_base):
 
     ret_pom_path = pom_path
     ret_jar_path = jar_path
+    bytes_avoided = 0
 
     # pom
     if ':' not in vpom_path:
         root, ext = os.path.splitext(vpom_path)
         symlink = False
+        renamed = False
         for ver in sorted(versions):
             dest = "%s-%s%s" % (root, ver, ext)
             if not symlink:
-                shutil.copy(os.path.realpath(vpom_path), dest)
+                renamed, avoided = _make_file_versioned(vpom_path, dest,
+                                                        copy_mode)
+                bytes_avoided += avoided
                 symlink = True
                 vpom_path = dest
                 ret_pom_path = dest
@@ -109,16 +169,20 @@ def _make_files_versioned(versions, pom_path, jar_path, pom_base, jar_base):
             # output file path for file lists
             _print_path_with_dirs(dest, pom_base)
         # remove unversioned pom
-        os.remove(pom_path)
+        if not renamed:
+            os.remove(pom_path)
 
     # jar
     if vjar_path:
         root, ext = os.path.splitext(vjar_path)
         symlink = False
+        renamed = False
         for ver in sorted(versions):
             dest = "%s-%s%s" % (root, ver, ext)
             if not symlink:
-                shutil.copy(os.path.realpath(vjar_path), dest)
+                renamed, avoided = _make_file_versioned(vjar_path, dest,
+                                                        copy_mode)
+                bytes_avoided += avoided
                 symlink = True
                 vjar_path = dest
                 ret_jar_path = dest
@@ -127,10 +191,11 @@ def _make_files_versioned(versions, pom_path, jar_path, pom_base, jar_base):
             # output file path for file lists
             _print_path_with_dirs(dest, jar_base)
         # remove unversioned jar
-        os.remove(jar_path)
+        if not renamed:
+            os.remove(jar_path)
 
     # return paths to versioned, but regular files (not symlinks)
-    return ret_pom_path, ret_jar_path
+    return ret_pom_path, ret_jar_path, bytes_avoided
 
 
 # Add a file to a ZIP archive (or JAR, WAR, ...) unless the file
@@ -196,28 +261,15 @@ def write_metadata(metadata_file, artifacts):
         metadata = Metadata()
 
     # pylint:disable=E1103
-    metadata.artifacts += deepcopy(artifacts)
+    metadata.artifacts += artifacts
 
     metadata.write_to_file(metadata_file)
 
 
-def _main():
-    usage="usage: %prog [options] metadata_path pom_path|<MVN spec> [jar_path]"
-    parser = OptionParser(usage=usage)
-    parser.add_option("-a","--append",type="str",
-                      help="Additional depmaps to add (gid:aid)  [default: %default]")
-    parser.add_option('-r', '--versions', type="str",
-                      help='Additional versions to add for each depmap')
-    parser.add_option('-n', '--namespace', type="str",
-                      help='Namespace to use for generated fragments', default="")
-    parser.add_option('--pom-base', type="str",
-                      help='Base path under which POM files are installed', default="")
-    parser.add_option('--jar-base', type="str",
-                      help='Base path under which JAR files are installed', default="")
-
-    parser.set_defaults(append=None)
-
-    (options, args) = parser.parse_args()
+def add_depmap(parser, options, args):
+    """Process arguments of single invocation, return tuple (metadata path,
+    list of MetadataArtifact to be added to the metadata, number of bytes
+    which didn't need to be copied when creating versioned files)"""
     append_deps = options.append
     add_versions = options.versions
     namespace = options.namespace
@@ -273,8 +325,10 @@ def _main():
     print(metadata_path)
 
     artifact = add_compat_versions(artifact, add_versions)
+    bytes_avoided = 0
     if add_versions:
-        pom_path, jar_path = _make_files_versioned(add_versions, pom_path, jar_path, pom_base, jar_base)
+        pom_path, jar_path, bytes_avoided = _make_files_versioned(add_versions, pom_path, jar_path,
+                                                                  pom_base, jar_base, options.copy_mode)
 
     if namespace:
         artifact.namespace = namespace
@@ -305,7 +359,66 @@ def _main():
         if not add_versions:
             _print_path_with_dirs(pom_path, pom_base)
 
-    write_metadata(metadata_path, am)
+    return metadata_path, am, bytes_avoided
+
+
+def _main():
+    usage="usage: %prog [options] metadata_path pom_path|<MVN spec> [jar_path]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("-a","--append",type="str",
+                      help="Additional depmaps to add (gid:aid)  [default: %default]")
+    parser.add_option('-r', '--versions', type="str",
+                      help='Additional versions to add for each depmap')
+    parser.add_option('-n', '--namespace', type="str",
+                      help='Namespace to use for generated fragments', default="")
+    parser.add_option('--pom-base', type="str",
+                      help='Base path under which POM files are installed', default="")
+    parser.add_option('--jar-base', type="str",
+                      help='Base path under which JAR files are installed', default="")
+    parser.add_option('--copy-mode', type="choice",
+                      choices=["copy", "reflink", "hardlink"], default="copy",
+                      help='How to create versioned files from symlinks, '
+                      'regular files are always renamed  [default: %default]')
+    parser.add_option('--report-bytes', action="store_true", default=False,
+                      help='Report number of bytes which did not need to be '
+                      'copied when creating versioned files')
+    parser.add_option('--batch', type="str", metavar="FILE",
+                      help='Read arguments of multiple invocations from FILE '
+                      '(- for standard input), one invocation per line')
+
+    parser.set_defaults(append=None)
+
+    (options, args) = parser.parse_args()
+    if options.batch:
+        if args:
+            parser.error("No arguments are allowed with --batch")
+        invocations = read_batch(parser, options.batch)
+    else:
+        invocations = [(options, args)]
+
+    # every metadata file is written only once, in order of first use
+    metadata_paths = []
+    artifacts = {}
+    bytes_avoided = 0
+    for (inv_options, inv_args) in invocations:
+        metadata_path, am, avoided = add_depmap(parser, inv_options, inv_args)
+        bytes_avoided += avoided
+        if metadata_path not in artifacts:
+            metadata_paths.append(metadata_path)
+            artifacts[metadata_path] = []
+        artifacts[metadata_path].extend(am)
+
+    # metadata are written only if all invocations succeeded, a failure
+    # fails the build anyway
+    for metadata_path in metadata_paths:
+        write_metadata(metadata_path, artifacts[metadata_path])
+
+    report_bytes = options.report_bytes
+    for (inv_options, inv_args) in invocations:
+        report_bytes = report_bytes or inv_options.report_bytes
+    if report_bytes:
+        sys.stderr.write("Avoided copying {0} bytes\n"
+                         .format(bytes_avoided))
 
 
 if __name__ == "__main__":
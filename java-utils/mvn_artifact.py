@@ -35,14 +35,16 @@ from __future__ import print_function
 from javapackages.metadata.metadata import Metadata
 from javapackages.metadata.artifact import MetadataArtifact
 from javapackages.metadata.dependency import MetadataDependency
+from javapackages.metadata.index import ProvidedArtifactIndex
 
 from javapackages.maven.artifact import Artifact, ArtifactFormatException
-from javapackages.maven.pom import POM, PomLoadingException
+from javapackages.maven.pom import POM
+from javapackages.maven.effectivepom import EffectivePOMBuilder
 from javapackages.ivy.ivyfile import IvyFile
 
-from javapackages.xmvn.xmvn_resolve import (XMvnResolve, ResolutionRequest,
-                                            XMvnResolveException)
-from javapackages.common.util import args_to_unicode
+from javapackages.xmvn.xmvn_resolve import (ResolutionRequest,
+                                            XMvnResolveException, get_session)
+from javapackages.common.util import args_to_unicode, read_batch
 from javapackages.common.exception import JavaPackagesToolsException
 
 import sys
@@ -83,22 +85,25 @@ class ExtensionsDontMatch(JavaPackagesToolsException):
     pass
 
 
-def get_parent_pom(pom):
+def get_reactor_index():
     try:
         metadata = Metadata.create_from_file(config)
-        known_artifacts = metadata.get_provided_artifacts()
-        # TODO: implement __hash__() and __cmp__() in MetadataArtifact
-        for artifact in known_artifacts:
-            if (artifact.extension == "pom" and
-               artifact.groupId == pom.groupId and
-               artifact.artifactId == pom.artifactId):
-                return POM(artifact.path)
     except IOError:
-        pass
+        return None
+    return ProvidedArtifactIndex(metadata.get_provided_artifacts())
+
+
+def get_parent_pom(pom, index=None):
+    if index is None:
+        index = get_reactor_index()
+    if index is not None:
+        artifact = index.get_artifact(pom.groupId, pom.artifactId, "pom")
+        if artifact:
+            return POM(artifact.path)
 
     req = ResolutionRequest(pom.groupId, pom.artifactId,
                             extension="pom", version=pom.version)
-    result = XMvnResolve.process_raw_request([req])[0]
+    result = get_session().resolve([req])[0]
     if not result:
         raise XMvnResolveException("Unable to resolve parent POM {g}:{a}:{e}:{v}"
                                    .format(g=pom.groupId, a=pom.artifactId,
@@ -107,6 +112,29 @@ def get_parent_pom(pom):
     return POM(result.artifactPath)
 
 
+def get_pom_builder(metadata=None):
+    """Return EffectivePOMBuilder resolving parents from artifacts of given
+    reactor metadata (read from reactor file if not given) or by
+    xmvn-resolve. Artifacts appended to the metadata later are taken into
+    account."""
+    if metadata is None:
+        try:
+            metadata = Metadata.create_from_file(config)
+        except IOError:
+            metadata = Metadata()
+    index = ProvidedArtifactIndex()
+    indexed = [0]
+
+    def resolve_parent(parent):
+        artifacts = metadata.get_provided_artifacts()
+        for artifact in artifacts[indexed[0]:]:
+            index.add(artifact)
+        indexed[0] = len(artifacts)
+        return get_parent_pom(parent, index)
+
+    return EffectivePOMBuilder(resolve_parent)
+
+
 def is_it_ivy_file(fpath):
     """Try to determine whether file in given path is Ivy file or not"""
     et = lxml.etree.ElementTree()
@@ -130,119 +158,17 @@ def add_artifact_elements(metadata, art_template, ppath=None, jpath=None):
             metadata.artifacts.append(art)
 
 
-def merge_sections(main, update):
-    for upd in update:
-        for curr in main:
-            if curr.compare_to(upd):
-                curr.merge_with(upd)
-                break
-        else:
-            main.append(upd)
-
-
-def get_model_variables(pom):
-    props = {}
-    if pom.groupId:
-        props["project.groupId"] = pom.groupId
-    if pom.artifactId:
-        props["project.artifactId"] = pom.artifactId
-    if pom.version:
-        props["project.version"] = pom.version
-    return props
-
-
-def expand_props(deps, props):
-    for d in deps:
-        d.interpolate(props)
-
-
-def gather_dependencies(pom_path):
+def gather_dependencies(pom_path, builder=None):
     if not pom_path:
         return []
-    pom = POM(pom_path)
-    pom_props = get_model_variables(pom)
-    deps, depm, props = _get_dependencies(pom)
-    # expand project model variables
-    expand_props(deps, pom_props)
-    expand_props(depm, pom_props)
-
-    curr_pom = pom
-    parent = pom.parent
-    while parent:
-        ppom = None
-        if parent.relativePath:
-            try:
-                ppom_path = os.path.join(os.path.dirname(curr_pom._path),
-                                         parent.relativePath)
-                if os.path.isdir(ppom_path):
-                    ppom_path = os.path.join(ppom_path, 'pom.xml')
-                ppom = POM(ppom_path)
-            except PomLoadingException:
-                pass
-        if not ppom:
-            ppom = get_parent_pom(parent)
-
-        parent = ppom.parent
-        pom_props = get_model_variables(ppom)
-        pdeps, pdepm, pprops = _get_dependencies(ppom)
-        expand_props(pdeps, pom_props)
-        expand_props(pdepm, pom_props)
-
-        # merge "dependencies" sections
-        merge_sections(deps, pdeps)
-        # merge "dependencyManagement" sections
-        merge_sections(depm, pdepm)
-
-        # merge "properties" sections
-        for pkey in pprops:
-            if pkey not in props:
-                props[pkey] = pprops[pkey]
-
-        curr_pom = ppom
-
-    for d in deps:
-        d.interpolate(props)
-
-    for dm in depm:
-        dm.interpolate(props)
-
-    # apply dependencyManagement on deps
-    for d in deps:
-        for dm in depm:
-            if d.compare_to(dm):
-                d.merge_with(dm)
-                break
-
-    # only deps with scope "compile" or "runtime" are interesting
-    deps = [x for x in deps if x.scope in ["", "compile", "runtime"]]
-
-    return deps
-
-
-def _get_dependencies(pom):
-    deps = []
-    depm = []
-    props = {}
-
-    deps.extend([x for x in pom.dependencies])
-    depm.extend([x for x in pom.dependencyManagement])
-    props = pom.properties
-
-    return deps, depm, props
+    if builder is None:
+        builder = get_pom_builder()
+    return builder.get_dependencies(pom_path)
 
 
-def _main():
-    OptionParser.format_epilog = lambda self, formatter: self.epilog
-    parser = OptionParser(usage=usage,
-                        epilog=epilog)
-    parser.add_option("--skip-dependencies", action="store_true", default=False,
-                      help="skip dependencies section in resulting metadata")
-    parser.add_option("-D", action="append", type="str",
-                      help="add artifact property", metavar="property=value")
-
-    sys.argv = args_to_unicode(sys.argv)
-
-    (options, args) = parser.parse_args()
+def create_artifact(parser, options, args, builder):
+    """Return tuple (MetadataArtifact, POM path, artifact path) for arguments
+    of single invocation"""
     if len(args) < 1:
         parser.error("At least 1 argument is required")
 
@@ -289,15 +215,10 @@ def _main():
     else:
         art.extension = "pom"
 
-    if os.path.exists(config):
-        metadata = Metadata.create_from_file(config)
-    else:
-        metadata = Metadata()
-
     if (not options.skip_dependencies and pom_path
        and not is_it_ivy_file(pom_path)):
         deps = []
-        mvn_deps = gather_dependencies(pom_path)
+        mvn_deps = gather_dependencies(pom_path, builder)
         for d in mvn_deps:
             deps.append(MetadataDependency.from_mvn_dependency(d))
         if deps:
@@ -310,7 +231,41 @@ def _main():
             key, value = d_opt.split("=")
             art.properties[key] = value
 
-    add_artifact_elements(metadata, art, pom_path, jar_path)
+    return art, pom_path, jar_path
+
+
+def _main():
+    OptionParser.format_epilog = lambda self, formatter: self.epilog
+    parser = OptionParser(usage=usage,
+                        epilog=epilog)
+    parser.add_option("--skip-dependencies", action="store_true", default=False,
+                      help="skip dependencies section in resulting metadata")
+    parser.add_option("-D", action="append", type="str",
+                      help="add artifact property", metavar="property=value")
+    parser.add_option("--batch", metavar="FILE",
+                      help="read arguments of multiple invocations from FILE "
+                      "(- for standard input), one invocation per line")
+
+    sys.argv = args_to_unicode(sys.argv)
+
+    (options, args) = parser.parse_args()
+    if options.batch:
+        if args:
+            parser.error("No arguments are allowed with --batch")
+        invocations = read_batch(parser, options.batch)
+    else:
+        invocations = [(options, args)]
+
+    if os.path.exists(config):
+        metadata = Metadata.create_from_file(config)
+    else:
+        metadata = Metadata()
+
+    builder = get_pom_builder(metadata)
+    for (options, args) in invocations:
+        art, pom_path, jar_path = create_artifact(parser, options, args,
+                                                  builder)
+        add_artifact_elements(metadata, art, pom_path, jar_path)
 
     metadata.write_to_file(config)
 
@@ -0,0 +1,222 @@
+#
+# Copyright (c) 2017, Red Hat, Inc.
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the
+#    distribution.
+# 3. Neither the name of the Red Hat nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import pickle
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        # backport for Python 2
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+import javapackages.common.config as config
+from javapackages.cache.cachefile import PICKLE_PROTOCOL, replace_file
+
+
+def _stat_key(st):
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+
+class BuildrootIndex(object):
+    """
+    Stat information about files a cache was created from.
+
+    The index remembers (mtime, size, inode) of every file accepted by the
+    cache. When a previous index is given, files with unchanged stat
+    information are reported as unchanged, so that caches can keep their
+    previous entries for them.
+    """
+
+    def __init__(self, root, files=None, previous=None):
+        self.root = root
+        # "path: (mtime, size, inode)" mapping
+        self.files = dict(files or {})
+        self._unchanged = set()
+        if previous is not None and previous.root == root:
+            for path, key in self.files.items():
+                if key is not None and previous.files.get(path) == key:
+                    self._unchanged.add(path)
+
+    def __getstate__(self):
+        return {'root': self.root, 'files': self.files}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._unchanged = set()
+
+    def paths(self):
+        """Return sorted list of indexed paths."""
+        return sorted(self.files)
+
+    def is_unchanged(self, path):
+        """
+        Return True if path didn't change since the previous index was
+        created, False otherwise.
+        """
+        return path in self._unchanged
+
+    def forget(self, path):
+        """
+        Make sure that path is considered changed next time this index is
+        used as previous index.
+        """
+        self.files[path] = None
+        self._unchanged.discard(path)
+
+
+class BuildrootScanner(object):
+    """
+    Walks buildroot once and classifies every file for all given caches.
+
+    Listing of every visited directory is remembered together with mtime of
+    the directory, so that directories which didn't change don't need to be
+    listed again, neither in this process nor in following builds.
+    """
+
+    def __init__(self, root, cachedir=None, dirs=None):
+        self.root = root
+        self._cachedir = cachedir
+        # "dirpath: (mtime, subdirs, filenames)" mapping
+        self.dirs = dirs or {}
+        # "classifier key: {path: (mtime, size, inode)}" mapping
+        self._files = {}
+
+    @classmethod
+    def load(cls, root, cachedir):
+        dirs = None
+        try:
+            with open(os.path.join(cachedir, config.buildroot_index_f),
+                      'rb') as indexfile:
+                cached_root, dirs = pickle.load(indexfile)
+            if cached_root != root:
+                dirs = None
+        except (IOError, ValueError, EOFError, TypeError, AttributeError,
+                ImportError, pickle.UnpicklingError):
+            # missing, corrupted or old index, buildroot is scanned again
+            dirs = None
+        return cls(root, cachedir=cachedir, dirs=dirs)
+
+    def _save(self):
+        if not self._cachedir:
+            return
+        data = pickle.dumps((self.root, self.dirs), PICKLE_PROTOCOL)
+        try:
+            replace_file(os.path.join(self._cachedir,
+                                      config.buildroot_index_f), [data])
+        except (IOError, OSError):
+            pass
+
+    def _list_dir(self, dirpath):
+        mtime = os.stat(dirpath).st_mtime
+        entry = self.dirs.get(dirpath)
+        if entry and entry[0] == mtime:
+            return entry
+        subdirs = []
+        filenames = []
+        if scandir is None:
+            for name in os.listdir(dirpath):
+                path = os.path.join(dirpath, name)
+                if os.path.isdir(path):
+                    # same as os.walk(), don't descend into symlinked dirs
+                    if not os.path.islink(path):
+                        subdirs.append(name)
+                else:
+                    filenames.append(name)
+            return (mtime, subdirs, filenames)
+        # type of entries is known from directory listing, only symlinks
+        # need to be followed
+        for entry in list(scandir(dirpath)):
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not entry.is_symlink():
+                    subdirs.append(entry.name)
+            else:
+                filenames.append(entry.name)
+        return (mtime, subdirs, filenames)
+
+    def _scan(self, classifiers):
+        dirs = {}
+        found = dict((key, {}) for key, _ in classifiers)
+        stack = [self.root]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                entry = self._list_dir(dirpath)
+            except OSError:
+                continue
+            dirs[dirpath] = entry
+            for name in entry[2]:
+                path = os.path.abspath(os.path.join(dirpath, name))
+                stat_key = False
+                for key, check_path in classifiers:
+                    if not check_path(path):
+                        continue
+                    if stat_key is False:
+                        try:
+                            stat_key = _stat_key(os.stat(path))
+                        except OSError:
+                            # broken symlink
+                            stat_key = None
+                    found[key][path] = stat_key
+            stack.extend(os.path.join(dirpath, d) for d in entry[1])
+        self.dirs = dirs
+        self._files.update(found)
+        self._save()
+
+    def get_files(self, key, classifiers):
+        """
+        Return "path: (mtime, size, inode)" mapping of files accepted by
+        classifier with given key. classifiers is a list of (key, check_path)
+        tuples, files are classified for all of them during single traversal.
+        """
+        if key not in self._files:
+            self._scan([c for c in classifiers if c[0] not in self._files])
+        return self._files[key]
+
+
+_scanners = {}
+
+
+def get_scanner(root, cachedir):
+    """Return BuildrootScanner shared by all caches in this process."""
+    scanner = _scanners.get((root, cachedir))
+    if scanner is None:
+        scanner = BuildrootScanner.load(root, cachedir)
+        _scanners[(root, cachedir)] = scanner
+    return scanner
@@ -33,8 +33,74 @@
 
 import os
 import logging
-import pickle
+import multiprocessing
 import javapackages.common.config as config
+from javapackages.common.exception import JavaPackagesToolsException
+from javapackages.cache.buildroot import BuildrootIndex, get_scanner
+from javapackages.cache.cachefile import (CacheFile, CacheFormatException,
+                                          write_cache_file)
+
+
+# all Cache subclasses, buildroot is classified for all of them
+# during single traversal
+_cache_classes = []
+
+
+# caches loaded by this process,
+# "(cache path, rpm pid): (cache, cache metadata, sections)" mapping
+_loaded = {}
+
+
+def register_cache(cls):
+    """Class decorator registering Cache subclass for buildroot scanning."""
+    _cache_classes.append(cls)
+    return cls
+
+
+def preload_caches(rpmconf):
+    """
+    Load all registered caches into memory of this process, so that they
+    don't have to be read again when they are created next time.
+    """
+    for cls in list(_cache_classes):
+        cls(rpmconf)
+
+
+def map_in_workers(func, items):
+    """
+    Return list of func results for given items, computed in a pool of
+    worker processes if configured. Order of results matches order of items.
+    """
+    workers = min(config.get_worker_count(), len(items))
+    if workers > 1:
+        try:
+            pool = multiprocessing.Pool(workers)
+        except (OSError, ImportError):
+            # e.g. no /dev/shm in the build environment
+            pool = None
+        if pool is not None:
+            try:
+                return pool.map(func, items)
+            finally:
+                pool.close()
+                pool.join()
+    return [func(item) for item in items]
+
+
+def _get_buildroot_fingerprint():
+    """
+    Return fingerprint of buildroot the caches are created for, None if
+    unknown. Fingerprint changes when the buildroot is created again.
+    """
+    try:
+        buildroot = config.get_buildroot()
+    except JavaPackagesToolsException:
+        return None
+    try:
+        st = os.stat(buildroot)
+    except OSError:
+        return (buildroot, None)
+    return (buildroot, st.st_dev, st.st_ino, st.st_mtime)
 
 
 class Cache(object):
@@ -44,6 +110,15 @@ class Cache(object):
         self._scl = rpmconf.scl
         self._fresh = False
         self._config_name = "default_cache"
+        self._index = None
+        # index and cache from previous build, if any
+        self._previous_index = None
+        self._previous_cache = {}
+        # metadata stored together with current cache entries
+        self._meta = {}
+        # "name: value" mapping of sections stored with current cache
+        # entries, decoded only when they are accessed
+        self._sections = {}
 
     def _process_buildroot(self):
         cache = {}
@@ -52,43 +127,83 @@ class Cache(object):
 
     def _find_paths(self):
         buildroot = config.get_buildroot()
-        paths = []
-        for dirpath, _, filenames in os.walk(buildroot):
-            for filename in filenames:
-                fpath = os.path.abspath(os.path.join(dirpath, filename))
-                if self._check_path(fpath):
-                    paths.append(fpath)
-        return paths
-
-    def _check_path(self, path):
+        classifiers = [(cls, cls._check_path) for cls in _cache_classes]
+        if type(self) not in _cache_classes:
+            classifiers.append((type(self), self._check_path))
+        files = get_scanner(buildroot, self._cachedir).get_files(type(self),
+                                                                 classifiers)
+        self._index = BuildrootIndex(buildroot, files,
+                                     previous=self._previous_index)
+        return self._index.paths()
+
+    def _get_previous_entry(self, path):
+        """
+        Return tuple (True, entry) if path didn't change since the previous
+        cache was written, (False, None) otherwise. Entry is None if path
+        didn't produce any cache entry last time.
+        """
+        if self._index is None or not self._index.is_unchanged(path):
+            return False, None
+        return True, self._previous_cache.get(path)
+
+    @staticmethod
+    def _check_path(path):
         # TODO: implement in subclass
         return False
 
     def _read_cache(self):
+        cachepath = os.path.join(self._cachedir, self._config_name)
+        loaded = _loaded.get((cachepath, self._rpm_pid))
+        if loaded is not None:
+            cache, self._meta, self._sections = loaded
+            return cache
         try:
-            cachepath = os.path.join(self._cachedir, self._config_name)
-            cachefile = open(cachepath, 'rb')
-            cached_pid, cache = pickle.load(cachefile)
-            cachefile.close()
+            cache = CacheFile(cachepath)
+            cached_pid = cache.meta["rpm_pid"]
+            buildroot = cache.meta["buildroot"]
             # check if the cache was most likely created during current build
-            if cached_pid != self._rpm_pid:
+            if (cached_pid != self._rpm_pid or
+                    buildroot != _get_buildroot_fingerprint()):
                 logging.warning("Cache in {path} is outdated, skipping"
                                 .format(path=cachepath))
+                # entries for files which didn't change can still be reused
+                self._previous_index = cache.meta["index"]
+                self._previous_cache = cache
                 return None
-        except IOError:
+        except (IOError, OSError, KeyError, CacheFormatException):
             return None
+        self._meta = cache.meta
+        self._sections = cache.sections
+        _loaded[(cachepath, self._rpm_pid)] = (cache, self._meta,
+                                               self._sections)
         return cache
 
+    def _get_meta(self, cache):
+        """Return metadata to be stored together with cache entries."""
+        return {"rpm_pid": self._rpm_pid,
+                "buildroot": _get_buildroot_fingerprint(),
+                "index": self._index}
+
+    def _get_sections(self, cache):
+        """
+        Return "name: value" mapping of sections to be stored together with
+        cache entries. Unlike metadata, sections are read only when they
+        are used.
+        """
+        return {}
+
     def _write_cache(self, cache):
+        cachepath = os.path.join(self._cachedir, self._config_name)
+        meta = self._get_meta(cache)
+        sections = self._get_sections(cache)
+        self._meta = meta
+        self._sections = sections
         try:
-            cachefile = open(os.path.join(self._cachedir,
-                                          self._config_name), 'wb')
-            content = (self._rpm_pid, cache)
-            pickle.dump(content, cachefile)
-            cachefile.close()
+            write_cache_file(cachepath, meta, cache, sections)
             self._fresh = True
-        except IOError:
+        except (IOError, OSError):
             return None
+        _loaded[(cachepath, self._rpm_pid)] = (cache, meta, sections)
         return cache
 
     def is_fresh(self):
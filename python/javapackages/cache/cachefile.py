@@ -0,0 +1,248 @@
+#
+# Copyright (c) 2017, Red Hat, Inc.
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the
+#    distribution.
+# 3. Neither the name of the Red Hat nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""
+On-disk format of caches.
+
+File starts with a header (magic, format version and length of metadata),
+followed by pickled metadata dictionary (rpm pid, buildroot, ...), table of
+entries, table of named sections (e.g. indexes of entries) and pickled
+entries and sections themselves:
+
+    header | metadata | entry table | section table | data
+
+where every table is
+
+    count | (offset, size, key length, key) * count
+
+Only the header, metadata and the tables are read when the file is opened.
+The file is memory-mapped and every entry or section is unpickled when it
+is accessed for the first time.
+"""
+
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+
+import six
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+MAGIC = b"JPKGCACHE"
+FORMAT_VERSION = 2
+# entries are pickled with protocol understood by both Python 2 and 3
+PICKLE_PROTOCOL = 2
+
+# magic, format version, length of pickled metadata
+_HEADER = struct.Struct("!9sII")
+_COUNT = struct.Struct("!I")
+# offset, size, key length
+_ENTRY = struct.Struct("!QII")
+
+
+class CacheFormatException(ValueError):
+    pass
+
+
+def _encode_key(key):
+    if isinstance(key, six.text_type):
+        if six.PY3:
+            return key.encode("utf-8", "surrogateescape")
+        return key.encode("utf-8")
+    return key
+
+
+def _decode_key(key):
+    if six.PY3:
+        return key.decode("utf-8", "surrogateescape")
+    return key
+
+
+def _get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def _encode_entries(entries):
+    keys = []
+    payloads = []
+    for key in sorted(entries):
+        keys.append(_encode_key(key))
+        payloads.append(pickle.dumps(entries[key], PICKLE_PROTOCOL))
+    return keys, payloads
+
+
+def _pack_table(keys, payloads, offset):
+    table = [_COUNT.pack(len(keys))]
+    for key, payload in zip(keys, payloads):
+        table.append(_ENTRY.pack(offset, len(payload), len(key)))
+        table.append(key)
+        offset += len(payload)
+    return table, offset
+
+
+def _get_table_size(keys):
+    return _COUNT.size + sum(_ENTRY.size + len(key) for key in keys)
+
+
+def write_cache_file(path, meta, entries, sections=None):
+    """
+    Write cache file with metadata dictionary meta, entries from
+    "key: value" mapping entries and sections from "name: value" mapping
+    sections. Keys and names are strings (usually paths for keys).
+
+    The file is replaced atomically, so processes which have the old file
+    mapped in memory are not affected.
+    """
+    keys, payloads = _encode_entries(entries)
+    section_keys, section_payloads = _encode_entries(sections or {})
+    meta_data = pickle.dumps(meta, PICKLE_PROTOCOL)
+
+    offset = (_HEADER.size + len(meta_data) + _get_table_size(keys) +
+              _get_table_size(section_keys))
+    table, offset = _pack_table(keys, payloads, offset)
+    section_table, _ = _pack_table(section_keys, section_payloads, offset)
+    table.extend(section_table)
+    payloads.extend(section_payloads)
+
+    chunks = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_data)), meta_data,
+              b"".join(table)]
+    chunks.extend(payloads)
+    replace_file(path, chunks)
+
+
+def replace_file(path, chunks):
+    """
+    Atomically replace file with given chunks of data, readers never see
+    partially written file. Raises IOError or OSError on failure.
+    """
+    fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                   prefix=".{0}.".format(os.path.basename(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        # mkstemp() creates the file readable only by its owner
+        os.chmod(tmppath, 0o666 & ~_get_umask())
+        os.rename(tmppath, path)
+    except (IOError, OSError):
+        try:
+            os.unlink(tmppath)
+        except OSError:
+            pass
+        raise
+
+
+def _read_table(data, pos):
+    """Return tuple ("key: (offset, size)" mapping, position after the
+    table) of table starting at given position"""
+    count, = _COUNT.unpack_from(data, pos)
+    pos += _COUNT.size
+    table = {}
+    for _ in range(count):
+        offset, size, key_size = _ENTRY.unpack_from(data, pos)
+        pos += _ENTRY.size
+        key = _decode_key(data[pos:pos + key_size])
+        pos += key_size
+        if offset + size > len(data):
+            raise CacheFormatException("Truncated cache file")
+        table[key] = (offset, size)
+    return table, pos
+
+
+class _LazyMapping(Mapping):
+    """Read-only "key: value" mapping of values pickled in memory-mapped
+    data, values are unpickled when they are accessed for the first time"""
+
+    def __init__(self, data, table):
+        self._data = data
+        # "key: (offset, size)" mapping
+        self._table = table
+        # "key: value" mapping of already decoded entries
+        self._decoded = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        offset, size = self._table[key]
+        value = pickle.loads(self._data[offset:offset + size])
+        self._decoded[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._table
+
+    def __iter__(self):
+        return iter(self._table)
+
+    def __len__(self):
+        return len(self._table)
+
+
+class CacheFile(_LazyMapping):
+    """
+    Read-only "key: value" mapping backed by memory-mapped cache file.
+    Entries are unpickled lazily, only when they are accessed. Named
+    sections are available as lazily unpickled mapping in sections.
+
+    Raises CacheFormatException if the file is not a cache file in current
+    format, IOError if it can't be read.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file can't be mapped
+                raise CacheFormatException("Empty cache file")
+        try:
+            magic, version, meta_size = _HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise CacheFormatException("Unsupported cache format")
+            pos = _HEADER.size
+            self.meta = pickle.loads(data[pos:pos + meta_size])
+            table, pos = _read_table(data, pos + meta_size)
+            sections, _ = _read_table(data, pos)
+        except (struct.error, EOFError, pickle.UnpicklingError) as e:
+            raise CacheFormatException(str(e))
+        super(CacheFile, self).__init__(data, table)
+        self.sections = _LazyMapping(data, sections)
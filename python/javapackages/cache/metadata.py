@@ -31,16 +31,64 @@
 #
 # Authors:  Michal Srb <msrb@redhat.com>
 
+import os
+
 import javapackages.common.config as config
 from javapackages.metadata.metadata import Metadata, MetadataLoadingException
-from javapackages.cache.cache import Cache
+from javapackages.metadata.index import ProvidedArtifactIndex
+from javapackages.cache.cache import Cache, map_in_workers, register_cache
+
+
+def _load_metadata(path):
+    try:
+        return Metadata.create_from_file(path)
+    except MetadataLoadingException:
+        return None
+
+
+def _load_all_metadata(paths):
+    """Parse metadata files, in a pool of worker processes if configured.
+
+    Returns list of Metadata objects (None for files which couldn't be
+    loaded) in the same order as given paths.
+    """
+    return map_in_workers(_load_metadata, paths)
+
+
+class _PathTrie(object):
+    """Trie of paths, split into path components."""
+
+    def __init__(self):
+        self._root = {}
 
-from copy import deepcopy
+    def add(self, path, value):
+        node = self._root
+        for part in path.rstrip("/").split("/"):
+            node = node.setdefault(part, {})
+        # None can't be a path component, it holds value of the node
+        node.setdefault(None, value)
 
+    def iter_prefixes(self, path):
+        """Yield values of all stored paths which are prefixes of path."""
+        node = self._root
+        for part in path.split("/"):
+            node = node.get(part)
+            if node is None:
+                return
+            if None in node:
+                yield node[None]
+
+
+@register_cache
 class MetadataCache(Cache):
     def __init__(self, rpmconf):
         super(MetadataCache, self).__init__(rpmconf)
         self._config_name = config.metadata_cache_f
+        self._provided_index = None
+        # "buildroot path: artifact" mapping and trie of the same paths,
+        # built on first lookup
+        self._artifact_paths = None
+        self._artifact_trie = None
         self._cache = self._read_cache()
 
         if self._cache is None:
@@ -52,51 +100,100 @@ class MetadataCache(Cache):
         cache = {}
 
         metadata_paths = self._find_paths()
+        previous = {}
+        to_parse = []
         for path in metadata_paths:
-            try:
-                metadata = Metadata.create_from_file(path)
-                if metadata:
-                    cache.update({path: metadata})
-            except MetadataLoadingException:
-                continue
+            unchanged, metadata = self._get_previous_entry(path)
+            if unchanged:
+                previous[path] = metadata
+            else:
+                to_parse.append(path)
+        parsed = dict(zip(to_parse, _load_all_metadata(to_parse)))
+
+        # merge in order of (sorted) paths, regardless of how they were parsed
+        for path in metadata_paths:
+            metadata = previous[path] if path in previous else parsed[path]
+            if metadata:
+                cache.update({path: metadata})
 
         return cache
 
-    def _check_path(self, path):
+    @staticmethod
+    def _check_path(path):
         # TODO
         if "/usr/share/maven-metadata/" in path and path.endswith(".xml"):
             return True
         return False
 
+    def _build_path_index(self):
+        self._artifact_paths = {}
+        self._artifact_trie = _PathTrie()
+        buildroot = config.get_buildroot()
+        order = 0
+        for path in sorted(self._cache):
+            for artifact in self._get_metadata(path).artifacts:
+                artifact_path = artifact.get_buildroot_path(prefix=buildroot)
+                if not artifact_path:
+                    continue
+                self._artifact_paths.setdefault(artifact_path, artifact)
+                self._artifact_trie.add(artifact_path, (order, artifact))
+                order += 1
+
     def get_artifact_for_path(self, path, can_be_dir=False):
-        for metadata in self._cache.values():
-            artifact = metadata.get_artifact_for_path(path,
-                                                      can_be_dir=can_be_dir)
-            if artifact:
-                return artifact
-        return None
+        if self._artifact_paths is None:
+            self._build_path_index()
+        path = os.path.abspath(path)
+        if not can_be_dir:
+            return self._artifact_paths.get(path)
+        # artifact path can be a directory (or a JAR file) containing path;
+        # the first artifact wins if there are more of them
+        matches = list(self._artifact_trie.iter_prefixes(path))
+        if not matches:
+            return None
+        return min(matches, key=lambda match: match[0])[1]
+
+    def _get_metadata(self, path):
+        # cached objects are shared by all callers, they must not be modified
+        return self._cache[path].freeze()
+
+    def _iter_metadata(self):
+        for path in self._cache:
+            yield self._get_metadata(path)
 
     def get_metadata_for_path(self, path):
+        """Return frozen Metadata for path, use copy() to modify it."""
         try:
-            return self._cache[path].copy()
+            return self._get_metadata(path)
         except KeyError:
             pass
         return None
 
     def get_provided_artifacts(self):
+        """Return list of frozen artifacts provided by all metadata."""
         artifacts = []
-        for metadata in self._cache.values():
-            artifacts.extend(deepcopy(metadata.artifacts))
+        for metadata in self._iter_metadata():
+            artifacts.extend(metadata.artifacts)
         return artifacts
 
+    def get_provided_index(self):
+        """
+        Return ProvidedArtifactIndex of all artifacts (provided and skipped)
+        from metadata in buildroot.
+        """
+        if self._provided_index is None:
+            self._provided_index = ProvidedArtifactIndex.from_metadata(
+                [self._get_metadata(path) for path in sorted(self._cache)])
+        return self._provided_index
+
     def get_skipped_artifacts(self):
+        """Return list of frozen artifacts skipped in all metadata."""
         artifacts = []
-        for metadata in self._cache.values():
-            artifacts.extend(deepcopy(metadata.skippedArtifacts))
+        for metadata in self._iter_metadata():
+            artifacts.extend(metadata.skippedArtifacts)
         return artifacts
 
     def get_provided_osgi(self):
         bundles = []
-        for metadata in self._cache.values():
+        for metadata in self._iter_metadata():
             bundles += metadata.get_osgi_provides()
         return bundles
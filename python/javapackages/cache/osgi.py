@@ -35,16 +35,75 @@
 import os
 
 import javapackages.common.config as config
+from javapackages.common.manifest import ManifestException
 from javapackages.common.osgi import OSGiBundle
-from javapackages.cache.cache import Cache
+from javapackages.cache.cache import Cache, map_in_workers, register_cache
 from javapackages.cache.metadata import MetadataCache
 
 
+def _load_bundle(entry):
+    path, bundle = entry
+    if bundle is None:
+        return OSGiBundle.from_manifest(path)
+    # bundle from metadata, only packages come from the manifest
+    bundle.read_packages(path)
+    return bundle
+
+
+def _load_bundles(entries):
+    """Read OSGi bundles from manifests, in a pool of worker processes if
+    configured.
+
+    Takes list of (path, bundle) tuples, bundle is None if it should be
+    read from the manifest, otherwise only its packages are read.
+
+    Returns list of OSGiBundle objects (None for paths which don't contain
+    a bundle) in the same order as given entries.
+    """
+    return map_in_workers(_load_bundle, entries)
+
+
+def _build_bundle_index(cache):
+    """Return "bundle name: [paths]" mapping of bundles in cache, paths are
+    in the same order as in the cache"""
+    index = {}
+    for path, bundle in cache.items():
+        index.setdefault(bundle.bundle, []).append(path)
+    return index
+
+
+def _build_package_index(cache):
+    """Return "package name: [(path, version)]" mapping of packages exported
+    by bundles in cache, paths are in the same order as in the cache"""
+    index = {}
+    for path, bundle in cache.items():
+        for package in bundle.exports:
+            index.setdefault(package.name, []).append((path, package.version))
+    return index
+
+
+def _is_package_requires_enabled():
+    conf = config.get_config()
+    if not conf:
+        return False
+    return bool(conf.get("osgi.req", {}).get("package_requires", False))
+
+
+def _version_in_range(version, version_range):
+    try:
+        return version_range.includes(version)
+    except ManifestException:
+        return False
+
+
+@register_cache
 class OSGiCache(Cache):
 
     def __init__(self, rpmconf):
         super(OSGiCache, self).__init__(rpmconf)
         self._config_name = config.osgi_cache_f
+        # "name: index" mapping of indexes used by this object
+        self._indexes = {}
         self._cache = self._read_cache()
         self._metadata_cache = MetadataCache(rpmconf)
 
@@ -59,42 +118,120 @@ class OSGiCache(Cache):
             pass
         return None
 
+    def get_bundles(self, name):
+        """Return list of all bundles with given name"""
+        paths = self._get_bundle_index().get(name, [])
+        return [self._cache[path] for path in paths]
+
     def get_bundle(self, name):
-        for bundle in self._cache.values():
-            if bundle.bundle == name:
-                return bundle
+        paths = self._get_bundle_index().get(name)
+        if paths:
+            return self._cache[paths[0]]
         return None
 
+    def get_package_providers(self, package):
+        """Return list of bundles exporting package with given name"""
+        entries = self._get_package_index().get(package, [])
+        return [self._cache[path] for path, _ in entries]
+
+    def resolve_imports(self, bundle):
+        """
+        Return list of bundles providing packages imported by given bundle.
+
+        Each imported package is resolved to the first bundle which exports
+        it in version matching the imported range. Optional imports, packages
+        exported by the bundle itself and packages not exported by any
+        bundle in the cache are skipped.
+        """
+        index = self._get_package_index()
+        exported = set([package.name for package in bundle.exports])
+        providers = []
+        # paths of providers already in the list
+        seen = set()
+        for package in bundle.imports:
+            if package.optional or package.name in exported:
+                continue
+            version_range = package.get_version_range()
+            for path, version in index.get(package.name, []):
+                if (version_range is None or
+                        _version_in_range(version, version_range)):
+                    if path not in seen:
+                        seen.add(path)
+                        providers.append(self._cache[path])
+                    break
+        return providers
+
+    def _get_bundle_index(self):
+        return self._get_index("bundles", _build_bundle_index)
+
+    def _get_package_index(self):
+        return self._get_index("packages", _build_package_index)
+
+    def _get_index(self, name, build):
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._sections.get(name)
+            if index is None:
+                # cache written without index
+                index = build(self._cache)
+            self._indexes[name] = index
+        return index
+
+    def _get_sections(self, cache):
+        return {"bundles": _build_bundle_index(cache),
+                "packages": _build_package_index(cache)}
+
     def _process_buildroot(self):
         # "path: OSGiBundle" mapping
         cache = {}
+        # (path, bundle) tuples whose manifest has to be read
+        manifest_entries = []
 
+        # packages of bundles from metadata are needed only for requires
+        # on bundles providing imported packages
+        read_packages = _is_package_requires_enabled()
         bundle_paths = self._find_paths()
         for path in bundle_paths:
             artifact = self._metadata_cache.get_artifact_for_path(path, can_be_dir=True)
             if artifact and artifact.has_osgi_information():
                 bundle = artifact.get_osgi_bundle()
+                if read_packages:
+                    # packages are not in metadata, read them from the
+                    # manifest
+                    manifest_entries.append((path, bundle))
+                else:
+                    cache[path] = bundle
+                # bundle doesn't come from the file itself, make sure it
+                # won't be reused when metadata change
+                self._index.forget(path)
             else:
-                bundle = OSGiBundle.from_manifest(path)
-                if bundle:
-                    if not bundle.namespace and self._scl:
-                        bundle.namespace = self._scl
-            if bundle:
-                cache.update({path: bundle})
-
-        return cache
-
-    def _check_path(self, path):
-        if os.path.islink(path):
-            return False
+                unchanged, bundle = self._get_previous_entry(path)
+                if not unchanged:
+                    manifest_entries.append((path, None))
+                cache[path] = bundle
+
+        bundles = _load_bundles(manifest_entries)
+        for (path, metadata_bundle), bundle in zip(manifest_entries, bundles):
+            if (bundle and metadata_bundle is None and not bundle.namespace
+                    and self._scl):
+                bundle.namespace = self._scl
+            cache[path] = bundle
+
+        # keep order of paths
+        return dict([(path, cache[path]) for path in bundle_paths
+                     if cache[path]])
+
+    @staticmethod
+    def _check_path(path):
+        # check suffix first, this is called for every file in buildroot
         if path.endswith(".jar"):
-            return True
+            return not os.path.islink(path)
         if path.endswith("/MANIFEST.MF"):
             # who knows where the manifest can be in buildroot.
             # this is an attempt to identify only MANIFEST.MF files
             # which are in %{_datadir} or %{_prefix}/lib
             if "/usr/share/" in path or "/usr/lib" in path:
-                return True
+                return not os.path.islink(path)
         return False
 
     def check_path_in_metadata(self, path):
@@ -41,6 +41,10 @@ class XMLBindingException(JavaPackagesToolsException):
     pass
 
 
+class FrozenBindingException(JavaPackagesToolsException):
+    pass
+
+
 def _get_item_type(spec):
     assert 0 < len(spec) <= 2, spec
     spec = tuple(spec)
@@ -69,49 +73,223 @@ def _get_item_name(spec):
 def _is_element(node):
     return isinstance(node.tag, six.string_types)
 
+
+# "tag: local name" mapping, tags are the same for most elements
+_localnames = {}
+
+
 def _localname(element):
-    return etree.QName(element.tag).localname
+    tag = element.tag
+    try:
+        return _localnames[tag]
+    except KeyError:
+        name = etree.QName(tag).localname
+        _localnames[tag] = name
+        return name
 
-def from_element(for_type, element):
+
+def _qualified_name(name, ns=None):
+    if ns:
+        return '{' + ns + '}' + name
+    return name
+
+
+# Parsers and serializers are compiled on first use of every ObjectBinding
+# subclass, so that "fields" and "types" declarations don't have to be
+# interpreted again for every element.
+#
+# "ObjectBinding subclass: parser function" mapping
+_parsers = {}
+# "ObjectBinding subclass: serializer function" mapping
+_serializers = {}
+
+
+def _parse_text(element):
+    text = element.text
+    return text.strip() if text is not None else None
+
+
+def _parse_dict(element):
+    new = {}
+    for child in element:
+        if _is_element(child):
+            new[_localname(child)] = _parse_text(child)
+    return new
+
+
+def _compile_parser(for_type):
+    """Return function creating object of given binding type from element."""
     if for_type is str:
-        return element.text.strip() if element.text is not None else None
-    if isinstance(for_type, list):
-        item_type = _get_item_type(for_type)
-        return [from_element(item_type, child) for child in element
-                if _is_element(child)]
-    if isinstance(for_type, set):
-        item_type = _get_item_type(for_type)
-        return set([from_element(item_type, child) for child in element
-                    if _is_element(child)])
+        return _parse_text
+    if isinstance(for_type, list) or isinstance(for_type, set):
+        container = type(for_type)
+        parse_item = _compile_parser(_get_item_type(for_type))
+
+        def parse_items(element):
+            items = [parse_item(child) for child in element
+                     if _is_element(child)]
+            return items if container is list else container(items)
+        return parse_items
     if for_type is dict:
-        new = {}
-        for child in element:
-            if isinstance(child.tag, six.string_types):
-                name = _localname(child)
-                value = from_element(str, child)
-                new[name] = value
-        return new
+        return _parse_dict
     if isinstance(for_type, type) and issubclass(for_type, ObjectBinding):
+        return _get_parser(for_type)
+    raise XMLBindingException("Unrecognized binding type: {0}".format(for_type))
+
+
+def _get_parser(cls):
+    try:
+        return _parsers[cls]
+    except KeyError:
+        pass
+
+    element_name = cls.element_name
+    field_parsers = {}
+    for name in cls.fields:
+        field_parsers[name] = _compile_parser(cls.types.get(name, str))
+
+    def parse(element):
         name = _localname(element)
-        if name != for_type.element_name:
+        if name != element_name:
             raise XMLBindingException("Unexpected element " + name)
         new = {}
         for child in element:
             if _is_element(child):
                 name = _localname(child)
-                if name in for_type.fields:
-                    value = from_element(for_type.types.get(name, str), child)
+                parse_field = field_parsers.get(name)
+                if parse_field is not None:
                     if name in new:
                         raise XMLBindingException("More values for element " + name)
-                    new[name] = value
-        return for_type(**new)
-    raise XMLBindingException("Unrecognized binding type: {0}".format(for_type))
+                    new[name] = parse_field(child)
+        return cls(**new)
+
+    _parsers[cls] = parse
+    return parse
+
+
+def from_element(for_type, element):
+    return _compile_parser(for_type)(element)
+
+
+def iterparse_fields(for_type, source, stream=()):
+    """Incrementally parse XML document with for_type root element.
+
+    Yields tuples (field name, value) for top-level fields of for_type. Items
+    of list and set fields named in stream are yielded one by one, as soon
+    as they are read, as tuples (field name, item), preceded by tuple
+    (field name, None) when the element of the field starts, so that empty
+    fields are reported too. Processed elements are cleared, so the whole
+    tree is never kept in memory.
+
+    source is a file name or a file object. Raises XMLBindingException
+    (or etree.XMLSyntaxError) when the document doesn't match for_type.
+    """
+    field_types = {}
+    for name in for_type.fields:
+        field_types[name] = for_type.types.get(name, str)
+    seen = set()
+    level = 0
+    for event, element in etree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            level += 1
+            if level == 1:
+                name = _localname(element)
+                if name != for_type.element_name:
+                    raise XMLBindingException("Unexpected element " + name)
+            elif level == 2:
+                name = _localname(element)
+                if name in field_types:
+                    if name in seen:
+                        raise XMLBindingException("More values for element " + name)
+                    seen.add(name)
+                    if name in stream:
+                        yield name, None
+            continue
+
+        level -= 1
+        if level == 2:
+            parent = element.getparent()
+            name = _localname(parent)
+            if name in stream and name in field_types:
+                item_type = _get_item_type(field_types[name])
+                yield name, from_element(item_type, element)
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+        elif level == 1:
+            name = _localname(element)
+            if name in field_types and name not in stream:
+                yield name, from_element(field_types[name], element)
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
 
 
 def _make_element(name, ns=None):
-    if ns:
-        name = '{' + ns + '}' + name
-    return etree.Element(name)
+    return etree.Element(_qualified_name(name, ns))
+
+
+def _compile_field_serializer(name, type_spec):
+    """Return function appending value of field with given type to element.
+
+    Values which don't match declared type are handled by generic
+    to_element().
+    """
+    if type_spec is str:
+        def serialize_text(parent, value, ns):
+            if isinstance(value, six.string_types):
+                child = etree.SubElement(parent, _qualified_name(name, ns))
+                child.text = value
+            else:
+                parent.append(to_element(value, name, type_spec, ns=ns))
+        return serialize_text
+    if isinstance(type_spec, list) or isinstance(type_spec, set):
+        item_name = _get_item_name(type_spec)
+        item_type = _get_item_type(type_spec)
+
+        def serialize_items(parent, value, ns):
+            if not (isinstance(value, list) or isinstance(value, set)):
+                parent.append(to_element(value, name, type_spec, ns=ns))
+                return
+            child = etree.SubElement(parent, _qualified_name(name, ns))
+            item_tag = _qualified_name(item_name, ns)
+            for item in value:
+                if type(item) is item_type and item_type is not str:
+                    child.append(_get_serializer(item_type)(item, ns))
+                elif isinstance(item, six.string_types):
+                    etree.SubElement(child, item_tag).text = item
+                else:
+                    child.append(to_element(item, name=item_name, ns=ns))
+        return serialize_items
+    return lambda parent, value, ns: parent.append(
+        to_element(value, name, type_spec, ns=ns))
+
+
+def _get_serializer(cls):
+    try:
+        return _serializers[cls]
+    except KeyError:
+        pass
+
+    element_name = cls.element_name
+    xmlns = cls.xmlns
+    field_serializers = [(name,
+                          _compile_field_serializer(name,
+                                                    cls.types.get(name, str)))
+                         for name in cls.fields]
+
+    def serialize(obj, ns=None):
+        ns = xmlns or ns
+        element = _make_element(element_name, ns=ns)
+        for name, serialize_field in field_serializers:
+            value = getattr(obj, name)
+            if value:
+                serialize_field(element, value, ns)
+        return element
+
+    _serializers[cls] = serialize
+    return serialize
+
 
 def to_element(obj, name=None, type_spec=None, ns=None):
     if isinstance(obj, six.string_types):
@@ -134,18 +312,70 @@ def to_element(obj, name=None, type_spec=None, ns=None):
             element.append(entry)
         return element
     if isinstance(obj, ObjectBinding):
-        name = obj.element_name
-        ns = obj.xmlns or ns
-        element = _make_element(name, ns=ns)
-        for item_name in obj.fields:
-            value = obj.values.get(item_name)
-            if value:
-                child = to_element(value, item_name,
-                                   obj.types.get(item_name, str), ns=ns)
-                element.append(child)
-        return element
+        return _get_serializer(type(obj))(obj, ns=ns)
+
+
+def _slotted_names(bases):
+    names = set()
+    for base in bases:
+        for klass in base.__mro__:
+            names.update(klass.__dict__.get('__slots__', ()))
+    return names
+
+
+class _BindingMeta(type):
+    """Metaclass storing fields of ObjectBinding subclasses in __slots__.
+
+    Every field gets its own slot, so reading a field is a plain attribute
+    access and instances don't need a dictionary. Per-class tables used by
+    ObjectBinding methods are computed here, once per class.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        if '__slots__' not in namespace:
+            slotted = _slotted_names(bases)
+            slots = []
+            for field in namespace.get('fields', ()):
+                if field in namespace:
+                    raise TypeError("Field {0} of {1} conflicts with class "
+                                    "attribute".format(field, name))
+                if field not in slotted:
+                    slots.append(field)
+            namespace['__slots__'] = tuple(slots)
+        cls = super(_BindingMeta, mcs).__new__(mcs, name, bases, namespace)
+
+        # "field: bit in _touched" mapping
+        cls._field_index = dict((field, i)
+                                for i, field in enumerate(cls.fields))
+        # (field, default value, factory of empty value) triples
+        initial = []
+        for field in cls.fields:
+            default, factory = None, None
+            if field in cls.defaults:
+                default = cls.defaults[field]
+            else:
+                item_type = cls.types.get(field, str)
+                if type(item_type) in (list, set):
+                    factory = type(item_type)
+                elif item_type == dict:
+                    factory = dict
+                elif item_type == str:
+                    factory = str
+            initial.append((field, default, factory))
+        cls._initial_values = initial
+        # fields with default values come first, like they always did
+        cls._value_order = ([f for f in cls.defaults if f in cls._field_index] +
+                            [f for f in cls.fields if f not in cls.defaults])
+        cls._equality_fields = [f for f in cls._value_order
+                                if cls.equality is None or f in cls.equality]
+        return cls
+
+
+class ObjectBinding(six.with_metaclass(_BindingMeta, object)):
+    # fields of subclasses are stored in slots, bit mask of fields which
+    # were set explicitly is in _touched, frozen objects can't be modified
+    __slots__ = ('_touched', '_frozen')
 
-class ObjectBinding(object):
     element_name = None
     fields = []
     types = {}
@@ -156,43 +386,85 @@ class ObjectBinding(object):
     def __init__(self, *args, **kwargs):
         assert self.element_name
         assert self.fields
-        self.values = self.defaults.copy()
-        self._touched = set()
-        for name in self.fields:
-            item_type = self.types.get(name, str)
-            if name not in self.values:
-                if type(item_type) in (list, set):
-                    self.values[name] = type(item_type)()
-                elif item_type == dict:
-                    self.values[name] = {}
-                elif item_type == str:
-                    self.values[name] = ''
-        values = list(zip(self.fields, args)) + list(kwargs.items())
-        for name, value in values:
-            setattr(self, name, value)
+        # bypass __setattr__, initial values are not "touched"
+        setter = object.__setattr__
+        for name, default, factory in self._initial_values:
+            setter(self, name, factory() if factory is not None else default)
+        touched = 0
+        field_index = self._field_index
+        for name, value in list(zip(self.fields, args)) + list(kwargs.items()):
+            setter(self, name, value)
+            if name in field_index:
+                touched |= 1 << field_index[name]
+        setter(self, '_touched', touched)
+        setter(self, '_frozen', False)
+
+    @property
+    def values(self):
+        """Dictionary with values of all fields
+
+        This is a snapshot, set fields through attributes."""
+        return dict((name, getattr(self, name)) for name in self._value_order)
 
     def __getattr__(self, name):
-        if name in self.fields:
-            return self.values.get(name)
+        # called only for fields which were deleted
+        if name in self._field_index:
+            return None
         return getattr(super(ObjectBinding, self), name)
 
     def __setattr__(self, name, value):
-        if name in self.fields:
-            self.values[name] = value
-            self._touched.add(name)
-        else:
-            super(ObjectBinding, self).__setattr__(name, value)
+        if self._frozen:
+            raise FrozenBindingException("Can't set {name}, {obj} is frozen"
+                                         .format(name=name, obj=self))
+        object.__setattr__(self, name, value)
+        index = self._field_index.get(name)
+        if index is not None:
+            object.__setattr__(self, '_touched', self._touched | (1 << index))
 
     def __contains__(self, name):
-        return name in self._touched
+        index = self._field_index.get(name)
+        return index is not None and bool(self._touched & (1 << index))
+
+    def __getstate__(self):
+        return (tuple(getattr(self, name) for name in self.fields),
+                self._touched)
+
+    def __setstate__(self, state):
+        setter = object.__setattr__
+        values, touched = state
+        for name, value in zip(self.fields, values):
+            setter(self, name, value)
+        setter(self, '_touched', touched)
+        # copies are never frozen
+        setter(self, '_frozen', False)
+
+    def freeze(self):
+        """Make this object and all binding objects it contains read-only.
+
+        Frozen objects can be shared without copying, copy() returns
+        a modifiable copy. Lists, sets and dictionaries in fields are not
+        replaced by immutable types, they must not be modified either."""
+        if self._frozen:
+            return self
+        object.__setattr__(self, '_frozen', True)
+        for name in self.fields:
+            value = getattr(self, name)
+            if isinstance(value, ObjectBinding):
+                value.freeze()
+            elif isinstance(value, list) or isinstance(value, set):
+                for item in value:
+                    if isinstance(item, ObjectBinding):
+                        item.freeze()
+        return self
+
+    def is_frozen(self):
+        return self._frozen
 
     def __repr__(self):
         return repr(self.values)
 
     def _get_values_for_equality(self):
-        if self.equality is not None:
-            return [v for k, v in self.values.items() if k in self.equality]
-        return [v for k, v in self.values.items()]
+        return [getattr(self, name) for name in self._equality_fields]
 
     def __eq__(self, that):
         return self is that or (type(self) is type(that) and
@@ -39,6 +39,8 @@ from javapackages.common.exception import JavaPackagesToolsException
 metadata_cache_f = "metadata.cache"
 # name of the cache file for OSGi stuff
 osgi_cache_f = "osgi.cache"
+# name of the file with buildroot directory listings
+buildroot_index_f = "buildroot.index"
 
 
 def get_config():
@@ -68,6 +70,34 @@ def get_config():
     return None
 
 
+def get_depgenerators_config():
+    """Return dictionary with "depgenerators" section of configuration file,
+    empty dictionary if there is no such section.
+    """
+    config = get_config()
+    return config.get("depgenerators", {}) if config else {}
+
+
+def get_worker_count():
+    """Return number of worker processes dependency generators may use.
+
+    The number is taken from "workers" key in "depgenerators" section of
+    configuration file. Value 1 (the default) means that everything is done
+    in the current process, 0 means one worker per CPU.
+    """
+    try:
+        workers = int(get_depgenerators_config().get("workers", 1))
+    except (TypeError, ValueError):
+        return 1
+    if workers == 0:
+        try:
+            import multiprocessing
+            workers = multiprocessing.cpu_count()
+        except (ImportError, NotImplementedError):
+            workers = 1
+    return max(workers, 1)
+
+
 def get_buildroot():
     """Return buildroot path, raise JavaPackagesToolsException if the path
     couldn't be determined.
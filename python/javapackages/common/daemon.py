@@ -0,0 +1,331 @@
+#
+# Copyright (c) 2017, Red Hat, Inc.
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the
+#    distribution.
+# 3. Neither the name of the Red Hat nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Optional daemon mode for dependency generators.
+
+rpmbuild starts a new interpreter for every generator invocation. In daemon
+mode the first invocation forks a server listening on a Unix socket in the
+cachedir, keyed by rpm PID. Following invocations only send their file list
+to the server and print its reply, so that modules are imported and caches
+are loaded once per build. Every request is handled in a forked child, which
+inherits the warm state of the server.
+"""
+
+import errno
+import os
+import select
+import socket
+import struct
+import sys
+import tempfile
+import time
+import traceback
+
+import six
+
+from javapackages.cache.cache import preload_caches
+from javapackages.common.config import get_depgenerators_config
+from javapackages.common.util import kill_parent_process
+
+# seconds the server waits for new requests before exiting
+DEFAULT_TIMEOUT = 60
+# seconds the client waits for newly started server
+CONNECT_TIMEOUT = 10
+# longest path of a Unix socket, sun_path has 108 bytes including the
+# terminating null byte on Linux
+MAX_SOCKET_PATH = 107
+
+_LENGTH = struct.Struct("!I")
+
+
+def is_enabled():
+    """Return True if daemon mode is enabled in configuration file."""
+    return bool(get_depgenerators_config().get("daemon", False))
+
+
+def get_socket_path(rpmconf):
+    return os.path.join(rpmconf.cachedir,
+                        "rpmgen-{pid}.sock".format(pid=rpmconf.rpm_pid))
+
+
+def _send(sock, *blocks):
+    data = b"".join(_LENGTH.pack(len(block)) + block for block in blocks)
+    sock.sendall(data)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise IOError("Connection closed unexpectedly")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock, count):
+    blocks = []
+    for _ in range(count):
+        size = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))[0]
+        blocks.append(_recv_exact(sock, size))
+    return blocks
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+class RpmgenServer(object):
+    """Serves dependency generator requests for one rpm build."""
+
+    def __init__(self, rpmconf, path, scriptdir, timeout=DEFAULT_TIMEOUT):
+        self._rpmconf = rpmconf
+        self._path = path
+        self._scriptdir = scriptdir
+        self._timeout = timeout
+        # "script path: namespace" mapping
+        self._generators = {}
+        self._sock = None
+
+    def _bind(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self._path)
+        except socket.error as e:
+            if e.errno != errno.EADDRINUSE:
+                raise
+            # another server may be running, otherwise the socket is stale
+            try:
+                _connect(self._path).close()
+                sock.close()
+                return False
+            except socket.error:
+                os.remove(self._path)
+                sock.bind(self._path)
+        sock.listen(5)
+        self._sock = sock
+        return True
+
+    def _is_build_running(self):
+        try:
+            os.kill(self._rpmconf.rpm_pid, 0)
+        except OSError as e:
+            return e.errno == errno.EPERM
+        return True
+
+    def serve(self):
+        if not self._bind():
+            return
+        try:
+            last_request = time.time()
+            while time.time() - last_request < self._timeout:
+                if not self._is_build_running():
+                    break
+                readable = select.select([self._sock], [], [], 1.0)[0]
+                if not readable:
+                    continue
+                conn = self._sock.accept()[0]
+                try:
+                    self._handle(conn)
+                except (IOError, socket.error):
+                    pass
+                finally:
+                    conn.close()
+                last_request = time.time()
+        finally:
+            self._sock.close()
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+    def _load_generator(self, script):
+        namespace = self._generators.get(script)
+        if namespace is None:
+            with open(script) as f:
+                code = compile(f.read(), script, 'exec')
+            namespace = {'__name__': '__rpmgen__',
+                         '__file__': script,
+                         'rpmconf': self._rpmconf}
+            six.exec_(code, namespace)
+            # load caches the generator works with into memory of the
+            # server, so that they are inherited by request handlers
+            try:
+                preload_caches(self._rpmconf)
+            except Exception:
+                # the generator reports the problem itself when it
+                # tries to load the cache
+                pass
+            self._generators[script] = namespace
+        return namespace
+
+    def _handle(self, conn):
+        script, data = _recv(conn, 2)
+        script = os.path.realpath(script.decode("utf-8"))
+        if os.path.dirname(script) != self._scriptdir:
+            _send(conn, b"1", b"",
+                  "Unknown generator {s}\n".format(s=script).encode("utf-8"))
+            return
+        try:
+            namespace = self._load_generator(script)
+        except Exception:
+            _send(conn, b"1", b"", traceback.format_exc().encode("utf-8"))
+            return
+        if six.PY3:
+            data = data.decode(sys.getfilesystemencoding(), 'surrogateescape')
+
+        out = tempfile.TemporaryFile()
+        err = tempfile.TemporaryFile()
+        try:
+            pid = os.fork()
+            if pid == 0:
+                self._run_generator(namespace, data, out, err)
+            rc = os.WEXITSTATUS(os.waitpid(pid, 0)[1])
+            out.seek(0)
+            err.seek(0)
+            _send(conn, str(rc).encode("ascii"), out.read(), err.read())
+        finally:
+            out.close()
+            err.close()
+
+    def _run_generator(self, namespace, data, out, err):
+        rc = 1
+        try:
+            os.dup2(out.fileno(), 1)
+            os.dup2(err.fileno(), 2)
+            sys.stdout = os.fdopen(1, 'w')
+            sys.stderr = os.fdopen(2, 'w')
+            self._sock.close()
+            namespace['TagBuilder'](filelist=six.StringIO(data))
+            rc = 0
+        except BaseException:
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(rc)
+
+
+def _spawn_server(rpmconf, path, scriptdir, timeout):
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+    try:
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+        # rpmbuild reads output of generators until EOF, the server must not
+        # keep any of the inherited descriptors open
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        try:
+            maxfd = os.sysconf("SC_OPEN_MAX")
+        except (AttributeError, ValueError):
+            maxfd = 1024
+        os.closerange(3, maxfd)
+        RpmgenServer(rpmconf, path, scriptdir, timeout=timeout).serve()
+    finally:
+        os._exit(0)
+
+
+def call_daemon(rpmconf, script, data, timeout=None):
+    """
+    Send file list to the server serving current build, start the server if
+    it isn't running yet. Return tuple (exit code, stdout, stderr) or None if
+    the server couldn't be reached.
+    """
+    if timeout is None:
+        timeout = get_depgenerators_config().get("daemon_timeout",
+                                                 DEFAULT_TIMEOUT)
+    script = os.path.realpath(script)
+    path = get_socket_path(rpmconf)
+    if len(path.encode("utf-8")) > MAX_SOCKET_PATH:
+        # the server couldn't bind the socket, don't wait for it
+        return None
+    try:
+        sock = _connect(path)
+    except socket.error:
+        try:
+            _spawn_server(rpmconf, path, os.path.dirname(script), timeout)
+        except OSError:
+            return None
+        sock = None
+        deadline = time.time() + CONNECT_TIMEOUT
+        while sock is None and time.time() < deadline:
+            try:
+                sock = _connect(path)
+            except socket.error:
+                time.sleep(0.05)
+        if sock is None:
+            return None
+    try:
+        _send(sock, script.encode("utf-8"), data)
+        rc, out, err = _recv(sock, 3)
+    except (IOError, socket.error):
+        return None
+    finally:
+        sock.close()
+    return int(rc), out, err
+
+
+def run(rpmconf, script, builder):
+    """
+    Run dependency generator script. If daemon mode is enabled, file list is
+    handled by the daemon serving current build, otherwise (or if the daemon
+    isn't reachable) builder is called with the file list directly.
+    """
+    if not is_enabled():
+        builder()
+        return
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    data = stdin.read()
+    result = call_daemon(rpmconf, script, data)
+    if result is None:
+        if six.PY3:
+            data = data.decode(sys.getfilesystemencoding(), 'surrogateescape')
+        builder(filelist=six.StringIO(data))
+        return
+    rc, out, err = result
+    getattr(sys.stdout, 'buffer', sys.stdout).write(out)
+    getattr(sys.stderr, 'buffer', sys.stderr).write(err)
+    if rc:
+        kill_parent_process(rpmconf)
@@ -32,28 +32,354 @@
 # Authors:  Alexander Kurtakov <akurtako@redhat.com>
 #           Michal Srb <msrb@redhat.com>
 
+import mmap
+import os
+import struct
 import zipfile
+import zlib
 from zipfile import ZipFile, BadZipfile
 from javapackages.common.exception import JavaPackagesToolsException
 
 
+MANIFEST_PATH = "META-INF/MANIFEST.MF"
+
+# end of central directory record
+_EOCD = struct.Struct("<4sHHHHIIH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+# central directory file header
+_CENTRAL = struct.Struct("<4sHHHHHHIIIHHHHHII")
+_CENTRAL_SIGNATURE = b"PK\x01\x02"
+# local file header
+_LOCAL = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+
+
+# "path: ((mtime, size), _ParsedManifest)" mapping of recently read manifests
+_parsed = {}
+_PARSED_MAX = 1024
+
+
 class ManifestException(JavaPackagesToolsException):
     pass
 
 
+class _UnsupportedArchive(Exception):
+    """Archive has to be read using zipfile module"""
+    pass
+
+
+def _read_zip_entry(path, name):
+    """
+    Return content of entry with given name from ZIP archive, or None if the
+    archive doesn't contain such entry or the file is not a ZIP archive.
+    Only end of central directory record, central directory header of the
+    entry and the entry itself are read. Raises _UnsupportedArchive for
+    ZIP64, encrypted or otherwise unusual archives.
+    """
+    name = name.encode("ascii")
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _EOCD.size:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _find_zip_entry(mm, size, name)
+        except (struct.error, zlib.error, ValueError):
+            raise _UnsupportedArchive()
+        finally:
+            mm.close()
+
+
+def _find_zip_entry(mm, size, name):
+    # EOCD is followed only by archive comment of at most 64 kB, which may
+    # contain the signature as well
+    lowest = max(0, size - _EOCD.size - 0xFFFF)
+    eocd = mm.rfind(_EOCD_SIGNATURE, lowest, size - _EOCD.size + 4)
+    while eocd >= 0:
+        (_, _, _, _, entries, cd_size,
+         cd_offset, comment_size) = _EOCD.unpack_from(mm, eocd)
+        if eocd + _EOCD.size + comment_size == size:
+            break
+        eocd = mm.rfind(_EOCD_SIGNATURE, lowest, eocd + 3)
+    else:
+        if mm.rfind(_EOCD_SIGNATURE, lowest) >= 0:
+            # possibly archive with trailing garbage
+            raise _UnsupportedArchive()
+        return None
+    if entries == 0xFFFF or cd_offset == 0xFFFFFFFF:
+        raise _UnsupportedArchive()
+    cd_start = eocd - cd_size
+    # offsets are relative to start of archive, which may be prefixed
+    base = cd_start - cd_offset
+    if base < 0:
+        raise _UnsupportedArchive()
+
+    # last header of entry with given name, same as in ZipFile
+    pos = mm.rfind(name, cd_start, eocd)
+    while pos >= 0:
+        header = pos - _CENTRAL.size
+        if (header >= cd_start and
+           mm[header:header + 4] == _CENTRAL_SIGNATURE):
+            fields = _CENTRAL.unpack_from(mm, header)
+            if fields[10] == len(name):
+                break
+        pos = mm.rfind(name, cd_start, pos)
+    else:
+        return None
+
+    (_, _, _, flags, method, _, _, crc, csize, usize,
+     _, _, _, _, _, _, offset) = fields
+    if flags & 0x1 or 0xFFFFFFFF in (csize, usize, offset):
+        raise _UnsupportedArchive()
+
+    local = base + offset
+    if mm[local:local + 4] != _LOCAL_SIGNATURE:
+        raise _UnsupportedArchive()
+    fields = _LOCAL.unpack_from(mm, local)
+    start = local + _LOCAL.size + fields[9] + fields[10]
+    data = mm[start:start + csize]
+    if method == zipfile.ZIP_STORED:
+        content = data
+    elif method == zipfile.ZIP_DEFLATED:
+        decompressor = zlib.decompressobj(-15)
+        content = decompressor.decompress(data) + decompressor.flush()
+    else:
+        raise _UnsupportedArchive()
+
+    if len(content) != usize or zlib.crc32(content) & 0xFFFFFFFF != crc:
+        raise _UnsupportedArchive()
+    return content
+
+
+def parse_headers(content):
+    """
+    Return "name: value" mapping of manifest headers. Continuation lines are
+    joined with previous line. Headers from all sections are returned, if
+    header is repeated, the last value is used.
+    """
+    headers = {}
+    name = None
+    for line in content.splitlines():
+        if line.startswith(" "):
+            if name is not None:
+                headers[name] += line[1:]
+            continue
+        name, sep, value = line.partition(":")
+        name = name.strip()
+        if not sep or not name:
+            name = None
+            continue
+        headers[name] = value.lstrip(" ")
+    for name in headers:
+        headers[name] = headers[name].strip()
+    return headers
+
+
+def _split(value, delimiter):
+    """Split value on delimiters which are not in quotes or version ranges"""
+    parts = []
+    start = 0
+    quoted = False
+    depth = 0
+    for i, char in enumerate(value):
+        if char == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char in "[(":
+            depth += 1
+        elif char in ")]":
+            depth = max(0, depth - 1)
+        elif char == delimiter and depth == 0:
+            parts.append(value[start:i])
+            start = i + 1
+    parts.append(value[start:])
+    return parts
+
+
+def _unquote(value):
+    value = value.strip()
+    if len(value) > 1 and value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    return value
+
+
+def parse_clauses(value):
+    """
+    Return list of ManifestClause parsed from value of OSGi header
+    (Require-Bundle, Import-Package, ...)
+    """
+    clauses = []
+    for clause in _split(value, ","):
+        paths = []
+        attributes = {}
+        directives = {}
+        for part in _split(clause, ";"):
+            part = part.strip()
+            if not part:
+                continue
+            idx = part.find("=")
+            if idx < 0:
+                paths.append(part)
+                continue
+            key = part[:idx].strip()
+            if key.endswith(":"):
+                directives[key[:-1].strip()] = _unquote(part[idx + 1:])
+            else:
+                attributes[key] = _unquote(part[idx + 1:])
+        if paths:
+            clauses.append(ManifestClause(paths, attributes, directives))
+    return clauses
+
+
+def parse_version(value):
+    """
+    Return comparable tuple (major, minor, micro, qualifier) of OSGi version.
+    Missing components are 0 or empty qualifier.
+    """
+    parts = value.strip().split(".", 3)
+    try:
+        numbers = [int(x or 0) for x in parts[:3]]
+    except ValueError:
+        raise ManifestException("Invalid version: {0}".format(value))
+    numbers += [0] * (3 - len(numbers))
+    qualifier = parts[3] if len(parts) > 3 else ""
+    return tuple(numbers) + (qualifier,)
+
+
+class VersionRange(object):
+    """
+    OSGi version range. Plain version means "at least version", ceiling is
+    None then.
+    """
+    def __init__(self, floor, ceiling=None, floor_inclusive=True,
+                 ceiling_inclusive=False):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.floor_inclusive = floor_inclusive
+        self.ceiling_inclusive = ceiling_inclusive
+
+    @classmethod
+    def from_string(cls, value):
+        value = _unquote(value)
+        if value[:1] in ("[", "(") and value[-1:] in ("]", ")"):
+            floor, sep, ceiling = value[1:-1].partition(",")
+            if not sep:
+                raise ManifestException("Invalid version range: {0}"
+                                        .format(value))
+            return cls(floor.strip(), ceiling.strip(),
+                       floor_inclusive=value[0] == "[",
+                       ceiling_inclusive=value[-1] == "]")
+        return cls(value)
+
+    def includes(self, version):
+        """Return True if given version is in this range"""
+        version = parse_version(version)
+        floor = parse_version(self.floor)
+        if version < floor or (version == floor and not self.floor_inclusive):
+            return False
+        if self.ceiling is None:
+            return True
+        ceiling = parse_version(self.ceiling)
+        return version < ceiling or (version == ceiling and
+                                     self.ceiling_inclusive)
+
+    def __str__(self):
+        if self.ceiling is None:
+            return self.floor
+        return "{0}{1},{2}{3}".format("[" if self.floor_inclusive else "(",
+                                      self.floor, self.ceiling,
+                                      "]" if self.ceiling_inclusive else ")")
+
+
+class ManifestClause(object):
+    """
+    Clause of OSGi header: one or more paths (bundle or package names)
+    followed by attributes (name=value) and directives (name:=value)
+    """
+    def __init__(self, paths, attributes=None, directives=None):
+        self.paths = paths
+        self.attributes = attributes or {}
+        self.directives = directives or {}
+
+    def is_optional(self):
+        return self.directives.get("resolution") == "optional"
+
+    def get_version_range(self, attribute="version"):
+        """Return VersionRange from given attribute, or None"""
+        value = self.attributes.get(attribute)
+        if not value:
+            return None
+        return VersionRange.from_string(value)
+
+
+def _get_package_version(clause, default):
+    # "specification-version" is deprecated alias of "version"
+    return clause.attributes.get("version",
+                                 clause.attributes.get("specification-version",
+                                                       default))
+
+
+class _ParsedManifest(object):
+    def __init__(self, content):
+        self.content = content
+        self.headers = parse_headers(content)
+        # "header name: [ManifestClause]" mapping
+        self.clauses = {}
+
+
 class Manifest(object):
 
     def __init__(self, path):
         self._path = path
-        self._manifest = self._read_manifest()
 
-        if self._manifest is None:
-            raise ManifestException("Unable to open MANIFEST.MF in {path}".format(path=self._path))
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime, st.st_size)
+        except OSError:
+            stamp = None
+        cached = _parsed.get(path)
+        if stamp is not None and cached is not None and cached[0] == stamp:
+            self._parsed = cached[1]
+        else:
+            content = self._read_manifest()
+            if content is None:
+                raise ManifestException("Unable to open MANIFEST.MF in {path}".format(path=self._path))
+            self._parsed = _ParsedManifest(content)
+            if stamp is not None:
+                if len(_parsed) >= _PARSED_MAX:
+                    _parsed.clear()
+                _parsed[path] = (stamp, self._parsed)
+        self._manifest = self._parsed.content
+
+    @property
+    def headers(self):
+        """"name: value" mapping of manifest headers, must not be modified"""
+        return self._parsed.headers
+
+    def get_clauses(self, header):
+        """Return list of ManifestClause of given header, must not be
+        modified"""
+        clauses = self._parsed.clauses.get(header)
+        if clauses is None:
+            clauses = parse_clauses(self.headers.get(header, ""))
+            self._parsed.clauses[header] = clauses
+        return clauses
 
     def _read_manifest(self):
+        if self._path.endswith("/" + MANIFEST_PATH):
+            with open(self._path, "rb") as mf:
+                return mf.read().decode("utf-8")
+        try:
+            content = _read_zip_entry(self._path, MANIFEST_PATH)
+        except (_UnsupportedArchive, EnvironmentError):
+            return self._read_manifest_zipfile()
+        if content is None:
+            return None
+        return content.decode("utf-8")
+
+    def _read_manifest_zipfile(self):
         mf = None
-        if self._path.endswith("/META-INF/MANIFEST.MF"):
-            mf = open(self._path, "rb")
         if zipfile.is_zipfile(self._path):
             # looks like "zipfile.is_zipfile()" is not reliable
             # see rhbz#889131 for more details
@@ -69,11 +395,33 @@ class Manifest(object):
         mf.close()
         return content.decode("utf-8")
 
+    def get_exported_packages(self):
+        """Return list of tuples (package, version) from Export-Package"""
+        packages = []
+        for clause in self.get_clauses("Export-Package"):
+            version = _get_package_version(clause, "0.0.0")
+            for package in clause.paths:
+                packages.append((package, version))
+        return packages
+
+    def get_imported_packages(self):
+        """
+        Return list of tuples (package, version range, optional) from
+        Import-Package, version range is empty if not specified
+        """
+        packages = []
+        for clause in self.get_clauses("Import-Package"):
+            version = _get_package_version(clause, "")
+            for package in clause.paths:
+                packages.append((package, version, clause.is_optional()))
+        return packages
+
     def get_requires(self):
         reqs = []
-        headers = self._parse_manifest()
-        if headers.get("Require-Bundle"):
-            for bundle in self._split_bundle_name(headers.get("Require-Bundle")):
+        for clause in self.get_clauses("Require-Bundle"):
+            if clause.is_optional():
+                continue
+            for bundle in clause.paths:
                 if bundle != "system.bundle":
                     reqs.append(bundle)
         return reqs
@@ -81,53 +429,10 @@ class Manifest(object):
     def get_provides(self):
         symbolicName = ""
         version = ""
-        for line in self._normalize_manifest():
-            if line.startswith("Bundle-SymbolicName:"):
-                symbolicName = line.split(':')[1].strip()
-                symbolicName = symbolicName.split(";")[0].strip()
-            if line.startswith("Bundle-Version:"):
-                versions = line.split(':')[1].strip()
-                versions = versions.split('.')[0:3]
-                version = ".".join(versions)
+        clauses = self.get_clauses("Bundle-SymbolicName")
+        if clauses:
+            symbolicName = clauses[0].paths[0]
+        if "Bundle-Version" in self.headers:
+            versions = self.headers["Bundle-Version"].split('.')[0:3]
+            version = ".".join(versions)
         return symbolicName, version
-
-    def _normalize_manifest(self):
-        lines = []
-        manifest = self._manifest.splitlines()
-        for line in manifest:
-            if line.startswith(' '):
-                lines[-1] += line.strip()
-            else:
-                lines.append(line.strip())
-        return lines
-
-    def _parse_manifest(self):
-        headers = {}
-        DELIM = ": "
-        for line in self._normalize_manifest():
-            split = line.split(DELIM)
-            if len(split) > 1:
-                name = split[0].strip()
-                headers[name] = split[1].strip()
-        return headers
-
-    def _split_bundle_name(self, bundles):
-        bundlenames = []
-        bundleline = ""
-        for bundle in bundles.split(','):
-            if not bundle:
-                continue
-            if "(" in bundle or "[" in bundle:
-                bundleline = bundle
-                continue
-            if bundleline:
-                bundle = bundleline + bundle
-            if ":=optional" in bundle:
-                bundleline = ""
-                continue
-            if ";" in bundle:
-                bundlenames.append(bundle.split(";")[0].strip())
-            else:
-                bundlenames.append(bundle.strip())
-            bundleline = ""
-        return bundlenames
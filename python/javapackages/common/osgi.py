@@ -34,7 +34,8 @@
 
 import re
 
-from javapackages.common.manifest import Manifest, ManifestException
+from javapackages.common.manifest import (Manifest, ManifestException,
+                                          VersionRange)
 from javapackages.common.strutils import _sanitize_version
 
 
@@ -92,13 +93,50 @@ class OSGiRequire(object):
         return OSGiUtils.get_rpm_str(self.bundle, version=version, namespace=ns)
 
 
+class OSGiPackage(object):
+    """
+    Java package exported or imported by OSGi bundle. Version of imported
+    package is version range, empty if any version is acceptable.
+    """
+
+    def __init__(self, name, version="", optional=False):
+        self.name = name
+        self.version = version
+        self.optional = optional
+
+    def get_version_range(self):
+        """Return VersionRange of imported package, None if any version
+        matches or the range is invalid"""
+        if not self.version:
+            return None
+        try:
+            return VersionRange.from_string(self.version)
+        except ManifestException:
+            return None
+
+
+def _get_packages(manifest):
+    exports = [OSGiPackage(name, version=ver)
+               for name, ver in manifest.get_exported_packages()]
+    imports = [OSGiPackage(name, version=ver, optional=optional)
+               for name, ver, optional in manifest.get_imported_packages()]
+    return exports, imports
+
+
 class OSGiBundle(object):
 
-    def __init__(self, bundle, version, namespace="", requires=[]):
+    # bundles from caches written by older versions have no packages
+    exports = []
+    imports = []
+
+    def __init__(self, bundle, version, namespace="", requires=[],
+                 exports=None, imports=None):
         self.bundle = bundle
         self.version = version
         self.namespace = namespace
         self.requires = requires
+        self.exports = exports or []
+        self.imports = imports or []
 
     @staticmethod
     def parse(osgistr):
@@ -138,7 +176,18 @@ class OSGiBundle(object):
 
         if not bundle:
             return None
-        return cls(bundle, version=version, requires=requires)
+        exports, imports = _get_packages(manifest)
+        return cls(bundle, version=version, requires=requires,
+                   exports=exports, imports=imports)
+
+    def read_packages(self, path):
+        """Set exported and imported packages from manifest in given path,
+        for bundles whose information doesn't come from the manifest"""
+        try:
+            manifest = Manifest(path)
+        except ManifestException:
+            return
+        self.exports, self.imports = _get_packages(manifest)
 
     @classmethod
     def from_properties(cls, properties):
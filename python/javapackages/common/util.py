@@ -32,6 +32,7 @@
 # Authors:  Michal Srb <msrb@redhat.com>
 
 import os
+import shlex
 import signal
 import sys
 import six
@@ -67,8 +68,38 @@ def args_to_unicode(args):
     return args
 
 
+def read_batch(parser, batch):
+    """
+    Return list of (options, args) parsed by OptionParser parser from lines
+    of batch file, "-" reads standard input. Empty lines and lines starting
+    with "#" are skipped. Parser must have option --batch.
+    """
+    if batch == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(batch) as f:
+            lines = f.readlines()
+
+    invocations = []
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        (options, args) = parser.parse_args(args_to_unicode(shlex.split(line)))
+        if options.batch:
+            parser.error("Option --batch cannot be used in batch file")
+        invocations.append((options, args))
+    return invocations
+
+
 def execute_command(command, input=None):
-    proc = subprocess.Popen([command], shell=True,
+    """Execute command, which is either a shell command line or a list of
+    arguments executed without shell. Return tuple (return code, stdout,
+    stderr)."""
+    if isinstance(command, list):
+        args, shell = command, False
+    else:
+        args, shell = [command], True
+    proc = subprocess.Popen(args, shell=shell,
                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                             stdin=subprocess.PIPE, universal_newlines=True)
     stdout, stderr = proc.communicate(input=input)
@@ -76,10 +107,40 @@ def execute_command(command, input=None):
     return proc.returncode, stdout, stderr
 
 
+# "(command, PATH): path to executable or None" mapping, results of
+# lookups done by this process
+_executables = {}
+
+
+def find_executable(cmd):
+    """Return path to executable cmd, searched for in PATH unless it
+    contains a directory, None if there is no such executable.
+
+    PATH is searched in this process, results (including negative ones)
+    are remembered for the lifetime of the process."""
+    search_path = os.environ.get("PATH", os.defpath)
+    key = (cmd, search_path)
+    try:
+        return _executables[key]
+    except KeyError:
+        pass
+
+    if os.path.dirname(cmd):
+        candidates = [cmd]
+    else:
+        candidates = [os.path.join(directory or os.curdir, cmd)
+                      for directory in search_path.split(os.pathsep)]
+    found = None
+    for candidate in candidates:
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            found = candidate
+            break
+    _executables[key] = found
+    return found
+
+
 def command_exists(cmd):
-    command = "type {cmd}".format(cmd=cmd)
-    rc, _, _ = execute_command(command)
-    return True if not rc else False
+    return find_executable(cmd) is not None
 
 
 def init_rpmgen(argv):
@@ -119,10 +180,13 @@ def _get_cachedir(path, create_if_not_exists=True):
 def get_logger(name):
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter("[%(levelname)s %(name)s] %(message)s")
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    # the logger may have been set up already when the generator is
+    # loaded again by the daemon
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter("[%(levelname)s %(name)s] %(message)s")
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
     return logger
 
 
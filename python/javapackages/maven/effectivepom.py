@@ -0,0 +1,192 @@
+#
+# Copyright (c) 2017, Red Hat, Inc.
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the
+#    distribution.
+# 3. Neither the name of the Red Hat nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import copy
+import os
+
+from javapackages.maven.pom import POM, PomLoadingException
+
+
+def get_management_key(dependency):
+    """
+    Return key identifying dependency in dependency management, dependencies
+    with the same key are equal according to AbstractArtifact.compare_to()
+    """
+    return (dependency.groupId, dependency.artifactId,
+            dependency.extension, dependency.classifier)
+
+
+def get_model_variables(pom):
+    props = {}
+    if pom.groupId:
+        props["project.groupId"] = pom.groupId
+    if pom.artifactId:
+        props["project.artifactId"] = pom.artifactId
+    if pom.version:
+        props["project.version"] = pom.version
+    return props
+
+
+def merge_section(main, update):
+    """
+    Merge dependencies from parent section into main section. Dependency is
+    merged into the first dependency with the same management key, or
+    appended if there is no such dependency.
+    """
+    index = {}
+    for curr in main:
+        index.setdefault(get_management_key(curr), curr)
+    for upd in update:
+        key = get_management_key(upd)
+        curr = index.get(key)
+        if curr is not None:
+            curr.merge_with(upd)
+        else:
+            main.append(upd)
+            index[key] = upd
+
+
+class EffectiveModel(object):
+    """
+    Dependencies, dependency management and properties of POM merged with
+    those of all its parents
+    """
+    def __init__(self, dependencies, dependencyManagement, properties):
+        self.dependencies = dependencies
+        self.dependencyManagement = dependencyManagement
+        self.properties = properties
+
+    def copy(self):
+        return EffectiveModel([copy.copy(d) for d in self.dependencies],
+                              [copy.copy(d) for d in self.dependencyManagement],
+                              dict(self.properties))
+
+    def interpolate(self):
+        """Expand properties in all dependencies"""
+        for d in self.dependencies:
+            d.interpolate(self.properties)
+        for dm in self.dependencyManagement:
+            dm.interpolate(self.properties)
+
+    def apply_management(self):
+        """Apply dependency management on dependencies"""
+        management = {}
+        for dm in self.dependencyManagement:
+            management.setdefault(get_management_key(dm), dm)
+        for d in self.dependencies:
+            dm = management.get(get_management_key(d))
+            if dm is not None:
+                d.merge_with(dm)
+
+
+class EffectivePOMBuilder(object):
+    """
+    Builds effective models of POM files. Model of every POM in the parent
+    chain is built only once and shared by all its children.
+    """
+    def __init__(self, resolve_parent):
+        """
+        resolve_parent is called with ParentPOM which cannot be found
+        using its relativePath and returns POM of the parent
+        """
+        self._resolve_parent = resolve_parent
+        # "(groupId, artifactId, version): POM" mapping of resolved parents
+        self._parents = {}
+        # "absolute path: EffectiveModel" mapping of already built models
+        self._models = {}
+
+    def get_model(self, pom):
+        """
+        Return EffectiveModel of given POM. Properties are expanded only
+        with project model variables of the POM they come from.
+        """
+        key = os.path.abspath(pom._path)
+        model = self._models.get(key)
+        if model is None:
+            model = self._build_model(pom)
+            self._models[key] = model
+        return model.copy()
+
+    def get_dependencies(self, pom_path):
+        """
+        Return list of dependencies with scope "compile" or "runtime" of POM
+        in given path
+        """
+        model = self.get_model(POM(pom_path))
+        model.interpolate()
+        model.apply_management()
+        return [x for x in model.dependencies
+                if x.scope in ["", "compile", "runtime"]]
+
+    def _build_model(self, pom):
+        variables = get_model_variables(pom)
+        deps = pom.dependencies
+        depm = pom.dependencyManagement
+        props = pom.properties
+        # expand project model variables
+        for d in deps:
+            d.interpolate(variables)
+        for dm in depm:
+            dm.interpolate(variables)
+
+        parent = self._get_parent_pom(pom)
+        if parent is not None:
+            pmodel = self.get_model(parent)
+            merge_section(deps, pmodel.dependencies)
+            merge_section(depm, pmodel.dependencyManagement)
+            for pkey in pmodel.properties:
+                if pkey not in props:
+                    props[pkey] = pmodel.properties[pkey]
+
+        return EffectiveModel(deps, depm, props)
+
+    def _get_parent_pom(self, pom):
+        parent = pom.parent
+        if not parent:
+            return None
+
+        if parent.relativePath:
+            try:
+                ppom_path = os.path.join(os.path.dirname(pom._path),
+                                         parent.relativePath)
+                if os.path.isdir(ppom_path):
+                    ppom_path = os.path.join(ppom_path, 'pom.xml')
+                return POM(ppom_path)
+            except PomLoadingException:
+                pass
+
+        key = (parent.groupId, parent.artifactId, parent.version)
+        ppom = self._parents.get(key)
+        if ppom is None:
+            ppom = self._resolve_parent(parent)
+            self._parents[key] = ppom
+        return ppom
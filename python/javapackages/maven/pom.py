@@ -50,35 +50,69 @@ class POM(object):
             raise PomLoadingException("Path \"{p}\" is invalid".format(p=path))
         self._doc = POMReader.load(path)
         self._path = os.path.join(path)
+        # "tag: [elements]" mapping of children of the project element
+        self._children = None
+        # "path: [elements]" mapping of already evaluated queries
+        self._selected = {}
 
     def __str__(self):
         return ":".join([self.groupId, self.artifactId, self.version])
 
+    def _select(self, path):
+        """
+        Return list of elements on given "/" separated path relative to
+        project element. Elements without namespace are considered only if
+        there are no elements in POM namespace, same as in POMReader.xpath()
+        """
+        nodes = self._selected.get(path)
+        if nodes is not None:
+            return nodes
+
+        if self._children is None:
+            self._children = {}
+            for child in self._doc:
+                self._children.setdefault(child.tag, []).append(child)
+
+        names = path.split("/")
+        for ns in ("{" + POMReader.POM_NAMESPACE + "}", ""):
+            nodes = self._children.get(ns + names[0], [])
+            for name in names[1:]:
+                nodes = [child for node in nodes
+                         for child in node.iterchildren(ns + name)]
+            if nodes:
+                break
+
+        self._selected[path] = nodes
+        return nodes
+
+    def _find(self, path):
+        nodes = self._select(path)
+        if nodes:
+            return nodes[0]
+        return None
+
     def has_parent(self):
-        parent = POMReader.find(self._doc, "./pom:parent")
-        if parent is not None:
-            return True
-        return False
+        return self._find("parent") is not None
 
     @property
     def parent(self):
-        aId = POMReader.find(self._doc, "./pom:parent/pom:artifactId")
+        aId = self._find("parent/artifactId")
         if aId is None:
             return None
         artifactId = aId.text
 
         groupId = ""
-        gId = POMReader.find(self._doc, "./pom:parent/pom:groupId")
+        gId = self._find("parent/groupId")
         if gId is not None:
             groupId = gId.text
 
         version = ""
-        ver = POMReader.find(self._doc, "./pom:parent/pom:version")
+        ver = self._find("parent/version")
         if ver is not None:
             version = ver.text
 
         relativePath = ""
-        relPath = POMReader.find(self._doc, "./pom:parent/pom:relativePath")
+        relPath = self._find("parent/relativePath")
         if relPath is not None:
             relativePath = relPath.text
 
@@ -89,9 +123,9 @@ class POM(object):
         """
         Effective groupId of the pom artifact taking into account parent groupId
         """
-        gId = POMReader.find(self._doc, "./pom:groupId")
+        gId = self._find("groupId")
         if gId is None:
-            gId = POMReader.find(self._doc, "./pom:parent/pom:groupId")
+            gId = self._find("parent/groupId")
         if gId is None:
             raise PomLoadingException("Unable to determine groupId")
         return gId.text.strip()
@@ -101,7 +135,7 @@ class POM(object):
         """
         Effective artifactId of the pom artifact
         """
-        aId = POMReader.find(self._doc, "./pom:artifactId")
+        aId = self._find("artifactId")
         if aId is None:
             raise PomLoadingException("Unable to determine artifactId")
         return aId.text.strip()
@@ -112,9 +146,9 @@ class POM(object):
         Effective version of the pom artifact taking into account parent
         version
         """
-        version = POMReader.find(self._doc, "./pom:version")
+        version = self._find("version")
         if version is None:
-            version = POMReader.find(self._doc, "./pom:parent/pom:version")
+            version = self._find("parent/version")
         if version is None:
             raise PomLoadingException("Unable to determine artifact version")
         return version.text.strip()
@@ -124,7 +158,7 @@ class POM(object):
         """
         Packaging type of artifact or "jar" if unspecified
         """
-        packaging = POMReader.find(self._doc, "./pom:packaging")
+        packaging = self._find("packaging")
         if packaging is None:
             # use default packaging type
             return "jar"
@@ -135,8 +169,7 @@ class POM(object):
         """
         List of dependencies
         """
-        xmlnodes = POMReader.xpath(self._doc,
-                                   "./pom:dependencies/pom:dependency")
+        xmlnodes = self._select("dependencies/dependency")
         return [Dependency.from_xml_element(x) for x in xmlnodes]
 
     @property
@@ -144,9 +177,7 @@ class POM(object):
         """
         List of dependencies from dependency management section
         """
-        xmlnodes = POMReader.xpath(self._doc,
-                                   "./pom:dependencyManagement"
-                                   "/pom:dependencies/pom:dependency")
+        xmlnodes = self._select("dependencyManagement/dependencies/dependency")
         return [Dependency.from_xml_element(x) for x in xmlnodes]
 
     @property
@@ -154,9 +185,7 @@ class POM(object):
         """
         List of plugins from plugin management section
         """
-        xmlnodes = POMReader.xpath(self._doc,
-                                   "./pom:pluginManagement"
-                                   "/pom:plugins/pom:plugin")
+        xmlnodes = self._select("pluginManagement/plugins/plugin")
         return [Plugin.from_xml_element(x) for x in xmlnodes]
 
     @property
@@ -164,8 +193,7 @@ class POM(object):
         """
         List of plugins
         """
-        xmlnodes = POMReader.xpath(self._doc,
-                                   "./pom:build/pom:plugins/pom:plugin")
+        xmlnodes = self._select("build/plugins/plugin")
         return [Plugin.from_xml_element(x) for x in xmlnodes]
 
     @property
@@ -173,8 +201,7 @@ class POM(object):
         """
         List of extensions
         """
-        xmlnodes = POMReader.xpath(self._doc,
-                                   "./pom:build/pom:extensions/pom:extension")
+        xmlnodes = self._select("build/extensions/extension")
         return [Extension.from_xml_element(x) for x in xmlnodes]
 
     @property
@@ -183,7 +210,7 @@ class POM(object):
         Dictionary consisting of properties specified in pom.xml
         """
         properties = {}
-        xmlnodes = POMReader.find(self._doc, "./pom:properties")
+        xmlnodes = self._find("properties")
         if xmlnodes is None:
             return properties
         propnodes = xmlnodes.getchildren()
@@ -31,6 +31,9 @@
 #
 # Authors:  Michal Srb <msrb@redhat.com>
 
+import os
+
+import six
 from lxml.etree import ElementTree, XMLParser
 from javapackages.common.exception import JavaPackagesToolsException
 
@@ -42,7 +45,34 @@ class PomLoadingException(JavaPackagesToolsException):
 POM_NAMESPACE = "http://maven.apache.org/POM/4.0.0"
 
 
+# "absolute path: ((mtime, size), document)" mapping of recently loaded
+# documents, documents are shared and must not be modified
+_documents = {}
+_DOCUMENTS_MAX = 256
+
+
 def load(pom_path):
+    """Return parsed document, documents are shared by all callers loading
+    the same unchanged file."""
+    try:
+        st = os.stat(pom_path)
+        key = os.path.abspath(pom_path)
+        stamp = (st.st_mtime, st.st_size)
+    except (OSError, TypeError):
+        key = None
+    if key is not None:
+        cached = _documents.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    doc = _parse(pom_path)
+    if key is not None:
+        if len(_documents) >= _DOCUMENTS_MAX:
+            _documents.clear()
+        _documents[key] = (stamp, doc)
+    return doc
+
+
+def _parse(pom_path):
     et = ElementTree()
     parser = XMLParser(remove_comments=True, strip_cdata=True)
     try:
@@ -72,20 +102,53 @@ def xpath(doc, xpath_str, namespace=POM_NAMESPACE):
     return ret
 
 
-def find_parts(doc, parts, xpath_str=".//"):
+def _find_first_descendants(doc, keys):
+    """Return "local name: first descendant element with that name" mapping
+    for given local names, found in single pass over descendants."""
+    found = {}
+    if hasattr(doc, "getroot"):
+        # ".//" on a document is evaluated relative to the root element
+        doc = doc.getroot()
+    nodes = doc.iterdescendants()
+    for node in nodes:
+        tag = node.tag
+        if not isinstance(tag, six.string_types):
+            continue
+        name = tag[tag.find('}') + 1:]
+        if name in keys and name not in found:
+            found[name] = node
+            if len(found) == len(keys):
+                break
+    return found
+
+
+def _find_nodes(doc, parts, xpath_str):
+    if xpath_str == ".//":
+        return _find_first_descendants(doc, parts)
+    found = {}
     for key in parts:
         node = doc.xpath('{0}*[local-name() = "{1}"]'.format(xpath_str, key))
-        if node is not None and len(node) > 0 and node[0].text is not None:
-            parts[key] = node[0].text.strip()
+        if node is not None and len(node) > 0:
+            found[key] = node[0]
+    return found
+
+
+def find_parts(doc, parts, xpath_str=".//"):
+    nodes = _find_nodes(doc, parts, xpath_str)
+    for key in parts:
+        node = nodes.get(key)
+        if node is not None and node.text is not None:
+            parts[key] = node.text.strip()
     return parts
 
 
 def find_raw_parts(doc, parts, xpath_str=".//"):
+    nodes = _find_nodes(doc, parts, xpath_str)
     for key in parts:
-        node = doc.xpath('{0}*[local-name() = "{1}"]'.format(xpath_str, key))
-        if node is not None and len(node) > 0:
-            if node[0].text is not None:
-                parts[key] = node[0].text.strip()
+        node = nodes.get(key)
+        if node is not None:
+            if node.text is not None:
+                parts[key] = node.text.strip()
             else:
                 # node is present, but it has no content
                 parts[key] = ""
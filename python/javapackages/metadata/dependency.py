@@ -34,6 +34,7 @@
 from javapackages.maven.artifact import Artifact
 import javapackages.common.strutils as Printer
 from javapackages.metadata.exclusion import MetadataExclusion
+from javapackages.metadata.index import ProvidedArtifactIndex
 
 from javapackages.common.binding import ObjectBinding
 
@@ -72,6 +73,8 @@ class MetadataDependency(ObjectBinding):
                                    pkg_ver=pkg_ver)
 
     def is_provided_by(self, artifacts):
+        if isinstance(artifacts, ProvidedArtifactIndex):
+            return artifacts.find_provider(self)
         for provided in artifacts:
             if (provided.groupId == self.groupId and
                provided.artifactId == self.artifactId and
@@ -91,6 +94,8 @@ class MetadataDependency(ObjectBinding):
         return False, None
 
     def is_skipped(self, skipped_artifacts):
+        if isinstance(skipped_artifacts, ProvidedArtifactIndex):
+            return skipped_artifacts.is_skipped(self)
         for skipped in skipped_artifacts:
             if (self.groupId == skipped.groupId and
                self.artifactId == skipped.artifactId and
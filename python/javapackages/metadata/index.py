@@ -0,0 +1,118 @@
+#
+# Copyright (c) 2017, Red Hat, Inc.
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the
+#    distribution.
+# 3. Neither the name of the Red Hat nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+def _provided_key(artifact):
+    return (artifact.groupId, artifact.artifactId, artifact.extension,
+            artifact.classifier, artifact.namespace)
+
+
+def _skipped_key(artifact):
+    return (artifact.groupId, artifact.artifactId, artifact.extension,
+            artifact.classifier)
+
+
+class ProvidedArtifactIndex(object):
+    """
+    Hash index of provided and skipped artifacts.
+
+    Artifacts are indexed by (groupId, artifactId, extension, classifier,
+    namespace). Every key maps to the non-compat artifact and to a
+    "compat version: artifact" mapping, so that dependencies can be matched
+    without going through all artifacts.
+    """
+
+    def __init__(self, artifacts=None, skipped_artifacts=None):
+        # "key: (non-compat artifact, {compat version: artifact})" mapping
+        self._provided = {}
+        # "(groupId, artifactId, extension): artifact" mapping
+        self._by_name = {}
+        self._skipped = set()
+        for artifact in artifacts or []:
+            self.add(artifact)
+        for skipped in skipped_artifacts or []:
+            self.add_skipped(skipped)
+
+    @classmethod
+    def from_metadata(cls, metadata_list):
+        index = cls()
+        for metadata in metadata_list:
+            for artifact in metadata.artifacts:
+                index.add(artifact)
+            for skipped in metadata.skippedArtifacts:
+                index.add_skipped(skipped)
+        return index
+
+    def add(self, artifact):
+        self._by_name.setdefault((artifact.groupId, artifact.artifactId,
+                                  artifact.extension), artifact)
+        key = _provided_key(artifact)
+        entry = self._provided.get(key)
+        if entry is None:
+            entry = (None, {})
+        plain, compat = entry
+        if artifact.is_compat():
+            for version in artifact.compatVersions:
+                compat.setdefault(version, artifact)
+        elif plain is None:
+            plain = artifact
+        self._provided[key] = (plain, compat)
+
+    def add_skipped(self, skipped):
+        self._skipped.add(_skipped_key(skipped))
+
+    def find_provider(self, dependency):
+        """
+        Return tuple (True, version of provider) if dependency is provided by
+        any indexed artifact, (False, None) otherwise.
+        """
+        entry = self._provided.get(_provided_key(dependency))
+        if entry is not None:
+            plain, compat = entry
+            if dependency.resolvedVersion:
+                provider = compat.get(dependency.resolvedVersion)
+            else:
+                provider = plain
+            if provider is not None:
+                return True, provider.version
+        return False, None
+
+    def get_artifact(self, groupId, artifactId, extension="jar"):
+        """
+        Return first indexed artifact with given groupId, artifactId and
+        extension (regardless of classifier, namespace and compat versions),
+        or None.
+        """
+        return self._by_name.get((groupId, artifactId, extension))
+
+    def is_skipped(self, dependency):
+        return _skipped_key(dependency) in self._skipped
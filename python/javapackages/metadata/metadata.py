@@ -42,8 +42,10 @@ from lxml import etree
 from javapackages.metadata.artifact import MetadataArtifact
 from javapackages.metadata.skippedartifact import MetadataSkippedArtifact
 from javapackages.common.exception import JavaPackagesToolsException
+import javapackages.common.config as config
 from javapackages.common.binding import (ObjectBinding, from_element,
-                                         to_element, XMLBindingException)
+                                         to_element, iterparse_fields,
+                                         XMLBindingException)
 
 
 class MetadataLoadingException(JavaPackagesToolsException):
@@ -68,10 +70,14 @@ class Metadata(ObjectBinding):
 
     def _validate_artifacts(self):
         for artifact in self.artifacts:
-            if not artifact.version:
-                raise MetadataInvalidException(
-                    "Artifact {a} does not have version in maven provides"
-                    .format(a=artifact))
+            Metadata._validate_artifact(artifact)
+
+    @staticmethod
+    def _validate_artifact(artifact):
+        if not artifact.version:
+            raise MetadataInvalidException(
+                "Artifact {a} does not have version in maven provides"
+                .format(a=artifact))
 
     def get_provided_artifacts(self):
         """Returns list of MetadataArtifact provided by given metadata."""
@@ -127,8 +133,9 @@ class Metadata(ObjectBinding):
 
     def get_artifact_for_path(self, path, can_be_dir=False):
         path = os.path.abspath(path)
+        buildroot = config.get_buildroot()
         for artifact in self.artifacts:
-            artifact_path = artifact.get_buildroot_path()
+            artifact_path = artifact.get_buildroot_path(prefix=buildroot)
             if can_be_dir:
                 # artifact_path can be a directory
                 if path.startswith(artifact_path):
@@ -151,19 +158,55 @@ class Metadata(ObjectBinding):
 
 
     @staticmethod
-    def create_from_file(path):
-        """Creates Metadata object from XML file, that can be gzipped"""
+    def _iterparse_file(path, stream=()):
+        """Incrementally parse XML file, that can be gzipped, yield tuples
+        (field name, value) as described in binding.iterparse_fields()"""
         with open(path, 'rb') as f:
-            try:
-                gzf = gzip.GzipFile(os.path.basename(path),
-                                    'rb', fileobj=f)
-                data = gzf.read()
-            except IOError:
+            if f.read(2) == b"\x1f\x8b":
+                f.seek(0)
+                source = gzip.GzipFile(os.path.basename(path), 'rb', fileobj=f)
+            else:
                 # not a compressed metadata, just rewind and read the data
                 f.seek(0)
-                data = f.read()
+                source = f
+            try:
+                for field in iterparse_fields(Metadata, source, stream):
+                    yield field
+            except (etree.XMLSyntaxError, XMLBindingException,
+                    IOError, EOFError) as e:
+                logging.warning("Failed to parse metadata {path}: {e}"
+                                .format(path=path, e=e))
+                raise MetadataLoadingException()
+
+    @staticmethod
+    def create_from_file(path):
+        """Creates Metadata object from XML file, that can be gzipped
+
+        The file is parsed incrementally, artifacts are created as soon as
+        they are read, so the XML tree is never kept in memory as a whole.
+        """
+        values = {}
+        artifacts = []
+        for name, value in Metadata._iterparse_file(path,
+                                                    stream=('artifacts',)):
+            if name == 'artifacts':
+                # None marks start of the element, it may be empty
+                if value is not None:
+                    artifacts.append(value)
+                values[name] = artifacts
+            else:
+                values[name] = value
+        return Metadata(**values)
 
-        return Metadata.create_from_string(data, path)
+    @staticmethod
+    def iter_artifacts_from_file(path):
+        """Yield MetadataArtifact objects from XML file, that can be gzipped,
+        as they are read"""
+        for name, value in Metadata._iterparse_file(path,
+                                                    stream=('artifacts',)):
+            if name == 'artifacts' and value is not None:
+                Metadata._validate_artifact(value)
+                yield value
 
     def write_to_file(self, path):
         with open(path, 'wb') as f:
@@ -30,11 +30,25 @@
 #
 # Authors:  Michal Srb <msrb@redhat.com>
 
+import logging
 import os
 import lxml.etree
 
+from javapackages.common.config import get_config
 from javapackages.common.util import execute_command, command_exists
 from javapackages.common.exception import JavaPackagesToolsException
+from javapackages.cache.cachefile import (CacheFile, CacheFormatException,
+                                          write_cache_file)
+
+# name of the file with cached results of xmvn-resolve
+resolve_cache_f = "xmvn-resolve.cache"
+# directories with system repository metadata, results of xmvn-resolve
+# are valid until something changes in them
+repository_dirs = ["/usr/share/maven-metadata"]
+# directories with XMvn configuration, relative paths are in the working
+# directory of the build
+xmvn_config_dirs = ["/etc/xmvn", "/etc/xmvn/config.d",
+                    ".xmvn", ".xmvn/config.d"]
 
 
 class XMvnResolveException(JavaPackagesToolsException):
@@ -54,11 +68,35 @@ class XMvnResolve(object):
         return command_exists(XMvnResolve.tool)
 
     @staticmethod
-    def process_raw_request(raw_request_list):
+    def process_raw_request(raw_request_list, builddir=None):
         if not raw_request_list:
             return []
-        command = "{tool} {args}".format(tool=XMvnResolve.tool,
-                                         args="--raw-request")
+        test_env = os.environ.get("JAVAPACKAGES_XMVN_RESOLVE_TEST", None)
+        cache = None if test_env else get_resolution_cache(builddir)
+        if cache is None:
+            return XMvnResolve._resolve(raw_request_list)
+
+        results = [None] * len(raw_request_list)
+        missing = []
+        for i, raw_request in enumerate(raw_request_list):
+            found, result = cache.get(raw_request)
+            if found:
+                results[i] = result
+            else:
+                missing.append(i)
+        if missing:
+            requests = [raw_request_list[i] for i in missing]
+            resolved = XMvnResolve._resolve(requests)
+            for i, result in zip(missing, resolved):
+                results[i] = result
+            cache.update(requests, resolved)
+            cache.save()
+        return results
+
+    @staticmethod
+    def _resolve(raw_request_list):
+        # executed directly, without shell
+        command = [XMvnResolve.tool, "--raw-request"]
         request = XMvnResolve._join_raw_requests(raw_request_list)
         test_env = os.environ.get("JAVAPACKAGES_XMVN_RESOLVE_TEST", None)
         if not test_env:
@@ -66,17 +104,34 @@ class XMvnResolve(object):
             if rc:
                 raise XMvnResolveException("xmvn-resolve failed:\n" + stderr)
         else:
-            stdout = ""
-            with open(test_env, "rb") as f:
-                lines = f.readlines()
-                stdout = lines[0].decode("UTF-8")
-                lines = lines[1:]
-            with open(test_env, "wb") as f:
-                f.write(b"\n".join(lines))
+            stdout = XMvnResolve._get_canned_results(test_env,
+                                                     raw_request_list)
 
         result = XMvnResolve._process_results(stdout)
         return result
 
+    @staticmethod
+    def _get_canned_results(path, raw_request_list):
+        """
+        Return results document for given requests from file with canned
+        resolutions, used by tests instead of running xmvn-resolve.
+        Requests which are not in the file are unresolvable.
+        """
+        canned = {}
+        doc = lxml.etree.parse(path)
+        for node in doc.xpath('/resolutions/resolution'):
+            key = _get_artifact_key(node.find('./request'))
+            result = lxml.etree.tostring(node.find('./result'))
+            canned[key] = result.decode("UTF-8")
+
+        results = ["<results>"]
+        for raw_request in raw_request_list:
+            request = lxml.etree.fromstring(raw_request.get_xml())
+            results.append(canned.get(_get_artifact_key(request),
+                                      "<result/>"))
+        results.append("</results>")
+        return "".join(results)
+
     @staticmethod
     def _join_raw_requests(raw_request_list):
         request = "<requests>"
@@ -112,6 +167,216 @@ class XMvnResolve(object):
         return results
 
 
+def _get_request_key(raw_request):
+    return raw_request.get_xml()
+
+
+def _get_artifact_key(request_node):
+    artifact = request_node.find('./artifact')
+    return tuple([artifact.findtext(name) or "" for name in
+                  ("groupId", "artifactId", "extension", "classifier",
+                   "version")])
+
+
+def _get_xmvn_config_dirs(builddir=None):
+    """Return absolute paths of XMvn configuration directories, relative
+    ones are in given build directory (current directory by default)"""
+    config_home = os.environ.get("XDG_CONFIG_HOME",
+                                 os.path.join(os.path.expanduser("~"),
+                                              ".config"))
+    user_dir = os.path.join(config_home, "xmvn")
+    dirs = xmvn_config_dirs + [user_dir, os.path.join(user_dir, "config.d")]
+    builddir = builddir or os.getcwd()
+    return [os.path.join(builddir, path) for path in dirs]
+
+
+def get_repository_fingerprint(dirs=None, builddir=None):
+    """
+    Return fingerprint of system repository and XMvn configuration, which
+    changes whenever metadata or configuration files are added, removed or
+    changed. Build directory contains project specific configuration.
+    """
+    if dirs is None:
+        dirs = repository_dirs + _get_xmvn_config_dirs(builddir)
+    fingerprint = []
+    for path in dirs:
+        try:
+            st = os.stat(path)
+            names = sorted(os.listdir(path))
+        except OSError:
+            fingerprint.append((path, None))
+            continue
+        fingerprint.append((path, st.st_mtime))
+        for name in names:
+            try:
+                st = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            fingerprint.append((name, st.st_mtime, st.st_size))
+    return fingerprint
+
+
+class ResolutionCache(object):
+    """
+    Persistent cache of xmvn-resolve results, "raw request: result" mapping.
+    Results are discarded when system repository fingerprint changes.
+    """
+
+    def __init__(self, path, fingerprint):
+        self._path = path
+        self._fingerprint = fingerprint
+        self._cache = {}
+        # results added since the cache was loaded
+        self._new = {}
+        try:
+            cache = CacheFile(path)
+            if cache.meta.get("fingerprint") == fingerprint:
+                self._cache = cache
+        except (IOError, OSError, CacheFormatException):
+            pass
+
+    def get(self, raw_request):
+        """
+        Return tuple (True, result) if there is a cached result for request,
+        (False, None) otherwise. Result is None for unresolvable artifacts.
+        Results pointing to files which don't exist anymore (e.g. temporary
+        effective POMs) are not used.
+        """
+        key = _get_request_key(raw_request)
+        if key in self._new:
+            result = self._new[key]
+        elif key in self._cache:
+            result = self._cache[key]
+        else:
+            return False, None
+        if (result is not None and result.artifactPath and
+                not os.path.exists(result.artifactPath)):
+            return False, None
+        return True, result
+
+    def update(self, raw_requests, results):
+        for raw_request, result in zip(raw_requests, results):
+            self._new[_get_request_key(raw_request)] = result
+
+    def save(self):
+        entries = dict(self._cache.items())
+        entries.update(self._new)
+        try:
+            directory = os.path.dirname(self._path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            write_cache_file(self._path, {"fingerprint": self._fingerprint},
+                             entries)
+        except (IOError, OSError) as e:
+            logging.warning("Unable to write xmvn-resolve cache {path}: {e}"
+                            .format(path=self._path, e=e))
+
+
+# "(cache path, build directory): ResolutionCache" mapping, caches loaded
+# by this process
+_resolution_caches = {}
+
+
+def _get_cache_config():
+    config = get_config()
+    return config.get("xmvn-resolve", {}) if config else {}
+
+
+def get_resolution_cache(builddir=None):
+    """
+    Return ResolutionCache configured in configuration file, None if
+    caching of xmvn-resolve results is disabled (default). Build directory
+    (current directory by default) may contain XMvn configuration.
+
+    Repository fingerprint is computed once per process, the repository
+    doesn't change during a generator run.
+    """
+    config = _get_cache_config()
+    if not config.get("cache", False):
+        return None
+    cachedir = config.get("cache_dir")
+    if not cachedir:
+        cachedir = os.environ.get("XDG_CACHE_HOME",
+                                  os.path.join(os.path.expanduser("~"),
+                                               ".cache"))
+        cachedir = os.path.join(cachedir, "javapackages")
+    path = os.path.join(cachedir, resolve_cache_f)
+    builddir = os.path.abspath(builddir or os.getcwd())
+    cache = _resolution_caches.get((path, builddir))
+    if cache is None:
+        cache = ResolutionCache(path,
+                                get_repository_fingerprint(builddir=builddir))
+        _resolution_caches[(path, builddir)] = cache
+    return cache
+
+
+class ResolverSession(object):
+    """
+    Resolver shared by the whole generator run.
+
+    xmvn-resolve reads one <requests> document until EOF, so a single
+    process can't serve more batches. Instead, requests are submitted to
+    the session, deduplicated, and resolved all together by one
+    xmvn-resolve process when some result is needed (see flush()). Results
+    are kept for the rest of the run.
+    """
+
+    def __init__(self, resolver=None, builddir=None):
+        self._resolver = resolver or self._process_raw_request
+        self._builddir = builddir
+        # "request key: result" mapping
+        self._results = {}
+        # (request key, request) pairs waiting for resolution
+        self._pending = []
+        self._pending_keys = set()
+
+    def _process_raw_request(self, raw_request_list):
+        return XMvnResolve.process_raw_request(raw_request_list,
+                                               builddir=self._builddir)
+
+    def submit(self, raw_request_list):
+        """Queue requests, they are resolved by the next flush()."""
+        for raw_request in raw_request_list:
+            key = _get_request_key(raw_request)
+            if key not in self._results and key not in self._pending_keys:
+                self._pending.append((key, raw_request))
+                self._pending_keys.add(key)
+
+    def flush(self):
+        """Resolve all queued requests in a single batch."""
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        self._pending_keys = set()
+        results = self._resolver([raw_request for _, raw_request in pending])
+        for (key, _), result in zip(pending, results):
+            self._results[key] = result
+
+    def resolve(self, raw_request_list):
+        """Return list of results (None for unresolvable artifacts) for
+        given requests, in the same order."""
+        self.submit(raw_request_list)
+        self.flush()
+        return [self._results[_get_request_key(raw_request)]
+                for raw_request in raw_request_list]
+
+
+# "build directory: ResolverSession" mapping
+_sessions = {}
+
+
+def get_session(builddir=None):
+    """Return ResolverSession of this process for given build directory
+    (current directory by default)."""
+    builddir = os.path.abspath(builddir or os.getcwd())
+    session = _sessions.get(builddir)
+    if session is None:
+        session = ResolverSession(builddir=builddir)
+        _sessions[builddir] = session
+    return session
+
+
 class ResolutionResult(object):
     def __init__(self, namespace="", compatVersion="", path=""):
         self.namespace = namespace
@@ -0,0 +1,536 @@
+import json
+import os
+import pickle
+import shutil
+import stat
+import tempfile
+import unittest
+import zipfile
+
+import javapackages.cache.buildroot as buildroot
+import javapackages.cache.cache as cache_module
+from javapackages.cache.buildroot import BuildrootIndex, BuildrootScanner
+from javapackages.cache.cachefile import (CacheFile, CacheFormatException,
+                                          write_cache_file)
+from javapackages.cache.metadata import MetadataCache
+from javapackages.cache.osgi import OSGiCache
+
+
+DATADIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+METADATA_OSGI = """<metadata xmlns="http://fedorahosted.org/xmvn/METADATA/2.3.0">
+    <artifacts>
+        <artifact>
+            <groupId>org.example</groupId>
+            <artifactId>m</artifactId>
+            <version>3</version>
+            <path>/usr/share/java/m.jar</path>
+            <properties>
+                <osgi.id>m</osgi.id>
+                <osgi.version>3.0</osgi.version>
+            </properties>
+        </artifact>
+    </artifacts>
+</metadata>
+"""
+
+
+class RpmConf(object):
+    def __init__(self, cachedir, rpm_pid, scl=None):
+        self.cachedir = cachedir
+        self.rpm_pid = rpm_pid
+        self.scl = scl
+
+
+class BuildrootTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.buildroot = os.path.join(self.workdir, "buildroot")
+        self.cachedir = os.path.join(self.workdir, "cache")
+        self.mdir = os.path.join(self.buildroot, "usr", "share",
+                                 "maven-metadata")
+        os.makedirs(self.mdir)
+        os.makedirs(self.cachedir)
+        self.old_buildroot = os.environ.get("RPM_BUILD_ROOT")
+        os.environ["RPM_BUILD_ROOT"] = self.buildroot
+        # buildroot listing is shared by all caches in the process
+        buildroot._scanners.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+        if self.old_buildroot is None:
+            del os.environ["RPM_BUILD_ROOT"]
+        else:
+            os.environ["RPM_BUILD_ROOT"] = self.old_buildroot
+
+    def add_metadata(self, name, source="depmap_new_versioned.xml"):
+        path = os.path.join(self.mdir, name)
+        shutil.copy(os.path.join(DATADIR, source), path)
+        return path
+
+    def add_bundle(self, filename, name, version="1.0", requires="x",
+                   headers=""):
+        javadir = os.path.join(self.buildroot, "usr", "share", "java")
+        if not os.path.isdir(javadir):
+            os.makedirs(javadir)
+        jar = zipfile.ZipFile(os.path.join(javadir, filename), "w")
+        jar.writestr("META-INF/MANIFEST.MF",
+                     "Bundle-SymbolicName: {n}\n"
+                     "Bundle-Version: {v}\n"
+                     "Require-Bundle: {r}\n{h}".format(n=name, v=version,
+                                                       r=requires, h=headers))
+        jar.close()
+        return os.path.join(javadir, filename)
+
+    def with_workers(self, workers, fn):
+        """Return fn() called with configured number of workers"""
+        return self.with_config({"depgenerators": {"workers": workers}}, fn)
+
+    def with_config(self, conf, fn):
+        """Return fn() called with given configuration"""
+        confdir = os.path.join(self.workdir, "conf")
+        if not os.path.isdir(confdir):
+            os.makedirs(confdir)
+        with open(os.path.join(confdir, "javapackages-config.json"), "w") as f:
+            json.dump(conf, f)
+        old_confdirs = os.environ.get("JAVACONFDIRS")
+        os.environ["JAVACONFDIRS"] = confdir
+        try:
+            buildroot._scanners.clear()
+            return fn()
+        finally:
+            if old_confdirs is None:
+                del os.environ["JAVACONFDIRS"]
+            else:
+                os.environ["JAVACONFDIRS"] = old_confdirs
+
+    def new_process(self):
+        """Forget caches loaded by this process, as if the next cache was
+        created by another generator process"""
+        cache_module._loaded.clear()
+        buildroot._scanners.clear()
+
+
+def is_xml(path):
+    return path.endswith(".xml")
+
+
+def is_txt(path):
+    return path.endswith(".txt")
+
+
+class TestBuildrootScanner(BuildrootTestCase):
+
+    def test_scan(self):
+        path = self.add_metadata("a.xml")
+        open(os.path.join(self.mdir, "b.txt"), "w").close()
+        scanner = BuildrootScanner(self.buildroot)
+        files = scanner.get_files("xml", [("xml", is_xml)])
+        self.assertEqual([path], list(files.keys()))
+
+    def test_single_traversal(self):
+        path = self.add_metadata("a.xml")
+        txt_path = os.path.join(self.mdir, "b.txt")
+        open(txt_path, "w").close()
+        scanner = BuildrootScanner(self.buildroot)
+        classifiers = [("xml", is_xml), ("txt", is_txt)]
+        self.assertEqual([path],
+                         list(scanner.get_files("xml", classifiers).keys()))
+        # both classifiers were served by the first traversal
+        scanner._scan = None
+        self.assertEqual([txt_path],
+                         list(scanner.get_files("txt", classifiers).keys()))
+
+    def test_persistent_listing(self):
+        path = self.add_metadata("a.xml")
+        BuildrootScanner.load(self.buildroot, self.cachedir).get_files(
+            "xml", [("xml", is_xml)])
+        scanner = BuildrootScanner.load(self.buildroot, self.cachedir)
+        self.assertTrue(self.mdir in scanner.dirs)
+        # unchanged directories are not listed again
+        mtime, subdirs, _ = scanner.dirs[self.mdir]
+        scanner.dirs[self.mdir] = (mtime, subdirs, ["a.xml", "fake.xml"])
+        files = scanner.get_files("xml", [("xml", is_xml)])
+        self.assertEqual(sorted([path, os.path.join(self.mdir, "fake.xml")]),
+                         sorted(files.keys()))
+
+    def test_changed_listing(self):
+        path = self.add_metadata("a.xml")
+        BuildrootScanner.load(self.buildroot, self.cachedir).get_files(
+            "xml", [("xml", is_xml)])
+        new_path = self.add_metadata("b.xml")
+        scanner = BuildrootScanner.load(self.buildroot, self.cachedir)
+        # make sure directory mtime differs from the recorded one
+        mtime = scanner.dirs[self.mdir][0]
+        os.utime(self.mdir, (mtime + 10, mtime + 10))
+        files = scanner.get_files("xml", [("xml", is_xml)])
+        self.assertEqual([path, new_path], sorted(files.keys()))
+
+    def test_symlinks(self):
+        path = self.add_metadata("a.xml")
+        os.symlink(self.mdir, os.path.join(self.buildroot, "linkdir"))
+        os.symlink(path, os.path.join(self.buildroot, "link.xml"))
+        os.symlink("missing", os.path.join(self.buildroot, "broken.xml"))
+
+        def listing():
+            scanner = BuildrootScanner(self.buildroot)
+            files = scanner.get_files("xml", [("xml", is_xml)])
+            return sorted(files.keys()), scanner.dirs[self.buildroot][1:]
+        files, entry = listing()
+        # symlinked directories are not followed, like in os.walk()
+        self.assertEqual(sorted([path,
+                                 os.path.join(self.buildroot, "broken.xml"),
+                                 os.path.join(self.buildroot, "link.xml")]),
+                         files)
+        self.assertEqual((["usr"], ["broken.xml", "link.xml"]),
+                         (entry[0], sorted(entry[1])))
+        old_scandir = buildroot.scandir
+        buildroot.scandir = None
+        try:
+            self.assertEqual((files, entry), listing())
+        finally:
+            buildroot.scandir = old_scandir
+
+    def test_corrupted_listing(self):
+        path = self.add_metadata("a.xml")
+        indexpath = os.path.join(self.cachedir, "buildroot.index")
+        for content in [b"garbage", pickle.dumps(1), pickle.dumps((1, 2, 3))]:
+            with open(indexpath, "wb") as f:
+                f.write(content)
+            scanner = BuildrootScanner.load(self.buildroot, self.cachedir)
+            self.assertEqual({}, scanner.dirs)
+            self.assertEqual([path], list(scanner.get_files(
+                "xml", [("xml", is_xml)]).keys()))
+
+    def test_listing_replaced(self):
+        self.add_metadata("a.xml")
+        old_umask = os.umask(0o022)
+        try:
+            BuildrootScanner.load(self.buildroot, self.cachedir).get_files(
+                "xml", [("xml", is_xml)])
+        finally:
+            os.umask(old_umask)
+        # written through a temporary file, which is renamed
+        self.assertEqual(["buildroot.index"], os.listdir(self.cachedir))
+        indexpath = os.path.join(self.cachedir, "buildroot.index")
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(indexpath).st_mode))
+
+
+class TestBuildrootIndex(BuildrootTestCase):
+
+    def get_index(self, previous=None):
+        files = BuildrootScanner(self.buildroot).get_files("xml",
+                                                           [("xml", is_xml)])
+        return BuildrootIndex(self.buildroot, files, previous=previous)
+
+    def test_new(self):
+        path = self.add_metadata("a.xml")
+        index = self.get_index()
+        self.assertEqual([path], index.paths())
+        self.assertFalse(index.is_unchanged(path))
+
+    def test_unchanged(self):
+        path = self.add_metadata("a.xml")
+        index = self.get_index(previous=self.get_index())
+        self.assertEqual([path], index.paths())
+        self.assertTrue(index.is_unchanged(path))
+
+    def test_changed(self):
+        path = self.add_metadata("a.xml")
+        previous = self.get_index()
+        with open(path, "a") as f:
+            f.write("\n")
+        index = self.get_index(previous=previous)
+        self.assertFalse(index.is_unchanged(path))
+
+    def test_new_file(self):
+        path = self.add_metadata("a.xml")
+        previous = self.get_index()
+        new_path = self.add_metadata("b.xml")
+        index = self.get_index(previous=previous)
+        self.assertEqual([path, new_path], index.paths())
+        self.assertTrue(index.is_unchanged(path))
+        self.assertFalse(index.is_unchanged(new_path))
+
+    def test_forget(self):
+        path = self.add_metadata("a.xml")
+        previous = self.get_index()
+        previous.forget(path)
+        index = self.get_index(previous=previous)
+        self.assertFalse(index.is_unchanged(path))
+
+
+class TestCacheFile(BuildrootTestCase):
+
+    def test_roundtrip(self):
+        path = os.path.join(self.cachedir, "test.cache")
+        entries = {"/a": [1, 2], "/b/\u00e9": {"x": "y"}}
+        write_cache_file(path, {"rpm_pid": 1}, entries)
+        cache = CacheFile(path)
+        self.assertEqual({"rpm_pid": 1}, cache.meta)
+        self.assertEqual(sorted(entries), sorted(cache))
+        self.assertTrue("/a" in cache)
+        self.assertFalse("/c" in cache)
+        self.assertEqual({}, cache._decoded)
+        self.assertEqual([1, 2], cache["/a"])
+        self.assertEqual(["/a"], list(cache._decoded))
+        self.assertEqual(entries, dict(cache.items()))
+
+    def test_sections(self):
+        path = os.path.join(self.cachedir, "test.cache")
+        write_cache_file(path, {"rpm_pid": 1}, {"/a": 1},
+                         {"index": {"x": ["/a"]}, "other": 2})
+        cache = CacheFile(path)
+        self.assertEqual(["/a"], list(cache))
+        self.assertEqual(["index", "other"], sorted(cache.sections))
+        # sections are decoded when they are accessed
+        self.assertEqual({}, cache.sections._decoded)
+        self.assertEqual({"x": ["/a"]}, cache.sections["index"])
+        self.assertEqual(["index"], list(cache.sections._decoded))
+        self.assertEqual(None, CacheFile(path).sections.get("missing"))
+
+    def test_replace(self):
+        path = os.path.join(self.cachedir, "test.cache")
+        write_cache_file(path, {}, {"/a": 1})
+        cache = CacheFile(path)
+        write_cache_file(path, {}, {"/a": 2})
+        # file is replaced, mapping of the old one still works
+        self.assertEqual(1, cache["/a"])
+        self.assertEqual(2, CacheFile(path)["/a"])
+        self.assertEqual(["test.cache"], os.listdir(self.cachedir))
+
+    def test_mode(self):
+        path = os.path.join(self.cachedir, "test.cache")
+        old_umask = os.umask(0o022)
+        try:
+            write_cache_file(path, {}, {"/a": 1})
+        finally:
+            os.umask(old_umask)
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_invalid(self):
+        path = os.path.join(self.cachedir, "test.cache")
+        for content in [b"", b"garbage", b"JPKGCACHE\0\0\0\2\0\0\0\0"]:
+            with open(path, "wb") as f:
+                f.write(content)
+            self.assertRaises(CacheFormatException, CacheFile, path)
+
+    def test_old_format(self):
+        self.add_metadata("a.xml")
+        with open(os.path.join(self.cachedir, "metadata.cache"), "wb") as f:
+            pickle.dump((1, None, {}), f)
+        cache = MetadataCache(RpmConf(self.cachedir, 1))
+        self.assertTrue(cache.is_fresh())
+        self.assertEqual(2, len(cache.get_provided_artifacts()))
+
+
+class TestMapInWorkers(BuildrootTestCase):
+
+    def test_order(self):
+        items = ["/a/{0}".format(i) for i in range(10)]
+        expected = [str(i) for i in range(10)]
+        for workers in (1, 3):
+            result = self.with_workers(
+                workers,
+                lambda: cache_module.map_in_workers(os.path.basename, items))
+            self.assertEqual(expected, result)
+
+    def test_empty(self):
+        self.assertEqual([], self.with_workers(
+            4, lambda: cache_module.map_in_workers(os.path.basename, [])))
+
+
+class TestMetadataCache(BuildrootTestCase):
+
+    def test_create(self):
+        path = self.add_metadata("a.xml")
+        cache = MetadataCache(RpmConf(self.cachedir, 1))
+        self.assertTrue(cache.is_fresh())
+        self.assertEqual(2, len(cache.get_provided_artifacts()))
+        self.assertTrue(cache.get_metadata_for_path(path))
+
+    def test_shared(self):
+        path = self.add_metadata("a.xml")
+        cache = MetadataCache(RpmConf(self.cachedir, 1))
+        metadata = cache.get_metadata_for_path(path)
+        # no copies, cached objects are frozen
+        self.assertTrue(metadata is cache.get_metadata_for_path(path))
+        self.assertTrue(metadata.is_frozen())
+        for artifact in cache.get_provided_artifacts():
+            self.assertTrue(artifact.is_frozen())
+            self.assertTrue(artifact in metadata.artifacts)
+
+    def test_read(self):
+        self.add_metadata("a.xml")
+        MetadataCache(RpmConf(self.cachedir, 1))
+        cache = MetadataCache(RpmConf(self.cachedir, 1))
+        self.assertFalse(cache.is_fresh())
+        self.assertEqual(2, len(cache.get_provided_artifacts()))
+
+    def test_buildroot_recreated(self):
+        self.add_metadata("a.xml")
+        MetadataCache(RpmConf(self.cachedir, 1))
+        shutil.rmtree(self.buildroot)
+        os.makedirs(self.mdir)
+        self.add_metadata("a.xml", source="depmap_compat_new.xml")
+        self.new_process()
+        # same build ID, but the cache was created for another buildroot
+        cache = MetadataCache(RpmConf(self.cachedir, 1))
+        self.assertTrue(cache.is_fresh())
+
+    def test_incremental(self):
+        path = self.add_metadata("a.xml")
+        changed_path = self.add_metadata("b.xml")
+        MetadataCache(RpmConf(self.cachedir, 1))
+        self.add_metadata("b.xml", source="depmap_compat_new.xml")
+        # next build runs in a new process
+        buildroot._scanners.clear()
+        cache = MetadataCache(RpmConf(self.cachedir, 2))
+        self.assertTrue(cache.is_fresh())
+        # entry for unchanged file was reused, changed file was parsed again
+        self.assertTrue(cache._get_previous_entry(path)[0])
+        self.assertFalse(cache._get_previous_entry(changed_path)[0])
+        self.assertEqual(4, len(cache.get_provided_artifacts()))
+
+    def test_parallel(self):
+        for i in range(4):
+            self.add_metadata("{i}.xml".format(i=i))
+        self.add_metadata("5.xml", source="depmap_compat_new.xml")
+        sequential = MetadataCache(RpmConf(self.cachedir, 1))
+        # separate cachedir, so that nothing is reused from sequential run
+        cachedir = os.path.join(self.workdir, "cache2")
+        os.makedirs(cachedir)
+        parallel = self.with_workers(
+            2, lambda: MetadataCache(RpmConf(cachedir, 1)))
+        self.assertTrue(parallel.is_fresh())
+        self.assertEqual(sequential.get_provided_artifacts(),
+                         parallel.get_provided_artifacts())
+
+    def test_artifact_for_path(self):
+        self.add_metadata("a.xml")
+        cache = MetadataCache(RpmConf(self.cachedir, 1))
+        jar = os.path.join(self.buildroot, "usr", "share", "java",
+                           "maven-idea-plugin", "maven-idea-plugin.jar")
+        artifact = cache.get_artifact_for_path(jar)
+        self.assertEqual("jar", artifact.extension)
+        self.assertEqual(artifact, cache.get_artifact_for_path(jar,
+                                                               can_be_dir=True))
+        manifest = os.path.join(jar, "META-INF", "MANIFEST.MF")
+        self.assertEqual(None, cache.get_artifact_for_path(manifest))
+        self.assertEqual(artifact, cache.get_artifact_for_path(manifest,
+                                                               can_be_dir=True))
+        self.assertEqual(None, cache.get_artifact_for_path(jar + "x",
+                                                           can_be_dir=True))
+
+
+class TestOSGiCache(BuildrootTestCase):
+
+    def test_parallel(self):
+        paths = []
+        for i in range(6):
+            paths.append(self.add_bundle("b{i}.jar".format(i=i),
+                                         "b{i}".format(i=i),
+                                         version="1.{i}".format(i=i),
+                                         requires="b{j}".format(j=i + 1)))
+        sequential = OSGiCache(RpmConf(self.cachedir, 1))
+        cachedir = os.path.join(self.workdir, "cache2")
+        os.makedirs(cachedir)
+        parallel = self.with_workers(2, lambda: OSGiCache(RpmConf(cachedir, 1)))
+
+        def bundles(cache):
+            result = []
+            for path in paths:
+                bundle = cache.get_bundle_for_path(path)
+                result.append((bundle.get_rpm_str(),
+                               [r.get_rpm_str() for r in bundle.requires]))
+            return result
+        self.assertEqual(("osgi(b0) = 1.0", ["osgi(b1)"]),
+                         bundles(sequential)[0])
+        self.assertEqual(bundles(sequential), bundles(parallel))
+
+    def test_bundle_index(self):
+        self.add_bundle("a.jar", "a", version="1")
+        self.add_bundle("b.jar", "b")
+        self.add_bundle("c.jar", "a", version="2")
+        cache = OSGiCache(RpmConf(self.cachedir, 1))
+        self.assertEqual("1", cache.get_bundle("a").version)
+        self.assertEqual(["1", "2"],
+                         [b.version for b in cache.get_bundles("a")])
+        self.assertEqual(None, cache.get_bundle("x"))
+        self.assertEqual([], cache.get_bundles("x"))
+
+        # cache read by another process uses stored index
+        self.new_process()
+        cache = OSGiCache(RpmConf(self.cachedir, 1))
+        self.assertFalse(cache.is_fresh())
+        self.assertEqual("b", cache.get_bundle("b").bundle)
+        self.assertEqual(["1", "2"],
+                         [b.version for b in cache.get_bundles("a")])
+
+    def test_resolve_imports(self):
+        self.add_bundle("a.jar", "a", headers="Import-Package: p.x;"
+                        "version=\"[2,3)\",p.y,p.z,p.a,p.w;"
+                        "resolution:=optional,p.none\n"
+                        "Export-Package: p.a\n")
+        self.add_bundle("b1.jar", "b", version="1",
+                        headers="Export-Package: p.x;version=1,p.y\n")
+        self.add_bundle("b2.jar", "b", version="2",
+                        headers="Export-Package: p.x;version=2.1\n")
+        self.add_bundle("c.jar", "c", headers="Export-Package: p.z,p.w\n")
+        # exports package imported and exported by "a"
+        self.add_bundle("0.jar", "other", headers="Export-Package: p.a\n")
+        cache = OSGiCache(RpmConf(self.cachedir, 1))
+        bundle = cache.get_bundle("a")
+        # both versions of "b" provide an imported package
+        self.assertEqual(["osgi(b) = 2", "osgi(b) = 1", "osgi(c) = 1.0"],
+                         [b.get_rpm_str()
+                          for b in cache.resolve_imports(bundle)])
+        self.assertEqual(["other", "a"],
+                         sorted([b.bundle for b in
+                                 cache.get_package_providers("p.a")],
+                                reverse=True))
+        self.assertEqual(["1", "2"], [b.version for b in
+                                      cache.get_package_providers("p.x")])
+        self.assertEqual([], cache.get_package_providers("p.none"))
+
+        # package index is stored with the cache
+        self.new_process()
+        cache = OSGiCache(RpmConf(self.cachedir, 1))
+        self.assertFalse(cache.is_fresh())
+        self.assertEqual(["b", "b", "c"],
+                         [b.bundle for b in
+                          cache.resolve_imports(cache.get_bundle("a"))])
+
+    def add_metadata_bundle(self):
+        self.add_bundle("m.jar", "manifest-name",
+                        headers="Export-Package: p.m;version=3\n")
+        with open(os.path.join(self.mdir, "m.xml"), "w") as f:
+            f.write(METADATA_OSGI)
+        self.add_bundle("a.jar", "a", headers="Import-Package: p.m\n")
+
+    def test_metadata_packages(self):
+        self.add_metadata_bundle()
+        cache = self.with_config({"osgi.req": {"package_requires": True}},
+                                 lambda: OSGiCache(RpmConf(self.cachedir, 1)))
+        # bundle comes from metadata, packages from the manifest
+        self.assertEqual(None, cache.get_bundle("manifest-name"))
+        self.assertEqual(["osgi(m) = 3.0"],
+                         [b.get_rpm_str() for b in
+                          cache.get_package_providers("p.m")])
+        self.assertEqual(["osgi(m) = 3.0"],
+                         [b.get_rpm_str() for b in
+                          cache.resolve_imports(cache.get_bundle("a"))])
+
+
+    def test_metadata_packages_disabled(self):
+        self.add_metadata_bundle()
+        cache = OSGiCache(RpmConf(self.cachedir, 1))
+        # manifests of bundles from metadata are not read by default
+        self.assertEqual("osgi(m) = 3.0", cache.get_bundle("m").get_rpm_str())
+        self.assertEqual([], cache.get_package_providers("p.m"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from javapackages.common.daemon import call_daemon
+
+
+GENERATOR = """
+import os
+import sys
+
+class TagBuilder(object):
+    def __init__(self, filelist=None):
+        for line in filelist.readlines():
+            if line.strip() == "fail":
+                raise Exception("requested failure")
+            print("{pid} {line}".format(pid=rpmconf.rpm_pid,
+                                        line=line.rstrip()))
+        sys.stderr.write("server {pid}\\n".format(pid=os.getppid()))
+"""
+
+
+class RpmConf(object):
+    def __init__(self, cachedir, rpm_pid, scl=None):
+        self.cachedir = cachedir
+        self.rpm_pid = rpm_pid
+        self.scl = scl
+
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.script = os.path.join(self.workdir, "test.req")
+        with open(self.script, "w") as f:
+            f.write(GENERATOR)
+        self.rpmconf = RpmConf(self.workdir, os.getpid())
+        self.servers = set()
+
+    def tearDown(self):
+        for pid in self.servers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        shutil.rmtree(self.workdir)
+
+    def call(self, data):
+        rc, out, err = call_daemon(self.rpmconf, self.script, data, timeout=5)
+        if err.startswith(b"server "):
+            self.servers.add(int(err.split()[1]))
+        return rc, out, err
+
+    def test_simple(self):
+        rc, out, err = self.call(b"a\nb\n")
+        self.assertEqual(0, rc, err)
+        self.assertEqual("{pid} a\n{pid} b\n".format(pid=os.getpid()),
+                         out.decode("utf-8"))
+
+    def test_reuse(self):
+        _, _, err1 = self.call(b"a\n")
+        _, _, err2 = self.call(b"b\n")
+        # both requests were handled by the same server
+        self.assertEqual(err1, err2)
+
+    def test_failure(self):
+        rc, out, err = self.call(b"fail\n")
+        self.assertEqual(1, rc)
+        self.assertEqual(b"", out)
+        self.assertTrue(b"requested failure" in err)
+
+    def test_long_socket_path(self):
+        cachedir = os.path.join(self.workdir, "x" * 100)
+        os.makedirs(cachedir)
+        self.rpmconf = RpmConf(cachedir, os.getpid())
+        start = time.time()
+        # caller falls back to running the generator itself at once
+        self.assertEqual(None, call_daemon(self.rpmconf, self.script, b"a\n",
+                                           timeout=5))
+        self.assertTrue(time.time() - start < 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from javapackages.maven.pom import POM
+from javapackages.maven.effectivepom import EffectivePOMBuilder
+
+
+PARENT = """<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <groupId>g</groupId>
+  <artifactId>parent</artifactId>
+  <version>1</version>
+  <properties>
+    <dep.version>2.0</dep.version>
+    <shared>parent</shared>
+  </properties>
+  <dependencies>
+    <dependency>
+      <groupId>g</groupId>
+      <artifactId>inherited</artifactId>
+      <version>1</version>
+    </dependency>
+  </dependencies>
+  <dependencyManagement>
+    <dependencies>
+      <dependency>
+        <groupId>g</groupId>
+        <artifactId>managed</artifactId>
+        <version>${dep.version}</version>
+        <scope>runtime</scope>
+      </dependency>
+    </dependencies>
+  </dependencyManagement>
+</project>
+"""
+
+CHILD = """<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <parent>
+    <groupId>g</groupId>
+    <artifactId>{parent}</artifactId>
+    <version>1</version>
+    <relativePath>{relpath}</relativePath>
+  </parent>
+  <artifactId>{name}</artifactId>
+  <properties>
+    <shared>child</shared>
+  </properties>
+  <dependencies>
+    <dependency>
+      <groupId>g</groupId>
+      <artifactId>managed</artifactId>
+    </dependency>
+    <dependency>
+      <groupId>g</groupId>
+      <artifactId>test</artifactId>
+      <version>1</version>
+      <scope>test</scope>
+    </dependency>
+  </dependencies>
+</project>
+"""
+
+
+class TestEffectivePOMBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.resolved = []
+        self.parent_path = self.write("parent/pom.xml", PARENT)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.workdir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def child(self, name, relpath="../parent"):
+        return self.write(os.path.join(name, "pom.xml"),
+                          CHILD.replace("{parent}", "parent")
+                               .replace("{relpath}", relpath)
+                               .replace("{name}", name))
+
+    def resolve_parent(self, parent):
+        self.resolved.append(parent.artifactId)
+        return POM(self.parent_path)
+
+    def test_dependencies(self):
+        builder = EffectivePOMBuilder(self.resolve_parent)
+        deps = builder.get_dependencies(self.child("a"))
+        self.assertEqual([(d.artifactId, d.version, d.scope) for d in deps],
+                         [("managed", "2.0", "runtime"),
+                          ("inherited", "1", "compile")])
+        self.assertEqual([], self.resolved)
+
+    def test_properties(self):
+        builder = EffectivePOMBuilder(self.resolve_parent)
+        model = builder.get_model(POM(self.child("a")))
+        self.assertEqual("child", model.properties["shared"])
+        self.assertEqual("2.0", model.properties["dep.version"])
+
+    def test_shared_parent(self):
+        builder = EffectivePOMBuilder(self.resolve_parent)
+        first = builder.get_dependencies(self.child("a", relpath="missing"))
+        second = builder.get_dependencies(self.child("b", relpath="missing"))
+        self.assertEqual(["parent"], self.resolved)
+        self.assertEqual([d.get_mvn_str() for d in first],
+                         [d.get_mvn_str() for d in second])
+        self.assertEqual(3, len(builder._models))
+
+    def test_models_not_modified(self):
+        builder = EffectivePOMBuilder(self.resolve_parent)
+        path = self.child("a")
+        deps = builder.get_dependencies(path)
+        deps[0].version = "changed"
+        model = builder.get_model(POM(self.parent_path))
+        self.assertEqual("${dep.version}",
+                         model.dependencyManagement[0].version)
+        self.assertEqual("2.0", builder.get_dependencies(path)[0].version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from javapackages.common.manifest import (Manifest, ManifestException,
+                                          parse_clauses, VersionRange)
+
+from test.misc import exception_expected
+
+
+MANIFEST = """Manifest-Version: 1.0
+Bundle-SymbolicName: org.example.bundle;singleton:=true
+Bundle-Version: 1.2.3.qualifier
+Require-Bundle: org.example.dep;bundle-version="[1.0,2.0)",
+ org.example.other
+"""
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def write_jar(self, name, compression=zipfile.ZIP_DEFLATED,
+                  manifest=MANIFEST, comment=b"", prefix=b""):
+        path = os.path.join(self.workdir, name)
+        with open(path, "wb") as f:
+            f.write(prefix)
+        jar = zipfile.ZipFile(path, "a", compression)
+        jar.writestr("org/example/Foo.class", b"\xca\xfe\xba\xbe")
+        if manifest is not None:
+            jar.writestr("META-INF/MANIFEST.MF", manifest)
+        jar.writestr("META-INF/maven/MANIFEST.MF", "Bundle-SymbolicName: no\n")
+        jar.comment = comment
+        jar.close()
+        return path
+
+    def check(self, path):
+        manifest = Manifest(path)
+        self.assertEqual(("org.example.bundle", "1.2.3"),
+                         manifest.get_provides())
+        self.assertEqual(["org.example.dep", "org.example.other"],
+                         manifest.get_requires())
+
+    def test_deflated(self):
+        self.check(self.write_jar("deflated.jar"))
+
+    def test_stored(self):
+        self.check(self.write_jar("stored.jar", zipfile.ZIP_STORED))
+
+    def test_comment(self):
+        self.check(self.write_jar("comment.jar", comment=b"PK\x05\x06 x"))
+
+    def test_prefixed(self):
+        self.check(self.write_jar("prefixed.jar", prefix=b"#!/bin/sh\n" * 8))
+
+    def test_plain_manifest(self):
+        path = os.path.join(self.workdir, "META-INF", "MANIFEST.MF")
+        os.mkdir(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(MANIFEST)
+        self.check(path)
+
+    @exception_expected(ManifestException)
+    def test_no_manifest(self):
+        Manifest(self.write_jar("nomanifest.jar", manifest=None))
+
+    @exception_expected(ManifestException)
+    def test_not_zip(self):
+        path = os.path.join(self.workdir, "text.jar")
+        with open(path, "w") as f:
+            f.write(MANIFEST)
+        Manifest(path)
+
+    def test_headers(self):
+        manifest = Manifest(self.write_jar("headers.jar"))
+        self.assertEqual("org.example.dep;bundle-version=\"[1.0,2.0)\","
+                         "org.example.other",
+                         manifest.headers["Require-Bundle"])
+        self.assertEqual("1.0", manifest.headers["Manifest-Version"])
+
+    def test_optional_quoted(self):
+        path = self.write_jar("optional.jar", manifest=MANIFEST.replace(
+            "org.example.other",
+            "org.example.other;resolution:=\"optional\""))
+        self.assertEqual(["org.example.dep"], Manifest(path).get_requires())
+
+    def test_memoised(self):
+        path = self.write_jar("memo.jar")
+        first = Manifest(path)
+        self.assertTrue(first.get_clauses("Require-Bundle") is
+                        Manifest(path).get_clauses("Require-Bundle"))
+
+        os.remove(path)
+        self.write_jar("memo.jar", manifest=MANIFEST.replace("1.2.3.", "4."))
+        os.utime(path, (0, 0))
+        self.assertEqual(("org.example.bundle", "4.qualifier"),
+                         Manifest(path).get_provides())
+
+    def test_packages(self):
+        path = self.write_jar("packages.jar", manifest=MANIFEST +
+                              "Export-Package: org.example.a;org.example.b;"
+                              "version=\"1.1\",org.example.c;"
+                              "specification-version=2,org.example.d\n"
+                              "Import-Package: org.x;version=\"[1,2)\","
+                              "org.y;resolution:=optional,org.z\n")
+        manifest = Manifest(path)
+        self.assertEqual([("org.example.a", "1.1"), ("org.example.b", "1.1"),
+                          ("org.example.c", "2"), ("org.example.d", "0.0.0")],
+                         manifest.get_exported_packages())
+        self.assertEqual([("org.x", "[1,2)", False), ("org.y", "", True),
+                          ("org.z", "", False)],
+                         manifest.get_imported_packages())
+        self.assertEqual([], Manifest(self.write_jar("plain.jar"))
+                         .get_exported_packages())
+
+
+class TestClauses(unittest.TestCase):
+
+    def test_import_package(self):
+        clauses = parse_clauses('org.a;org.b;version="[1.2,2)";'
+                                'resolution:=optional, org.c;version=1.0,'
+                                'org.d;x-internal:=true;attr="a,b"')
+        self.assertEqual(3, len(clauses))
+        self.assertEqual(["org.a", "org.b"], clauses[0].paths)
+        self.assertEqual({"version": "[1.2,2)"}, clauses[0].attributes)
+        self.assertTrue(clauses[0].is_optional())
+        self.assertFalse(clauses[1].is_optional())
+        self.assertEqual({"x-internal": "true"}, clauses[2].directives)
+        self.assertEqual("a,b", clauses[2].attributes["attr"])
+
+    def test_unquoted_range(self):
+        clauses = parse_clauses("org.a;bundle-version=[1.0,2.0),org.b")
+        self.assertEqual(["org.a", "org.b"], [c.paths[0] for c in clauses])
+
+    def test_version_range(self):
+        clause = parse_clauses('org.a;version="(1.2,2.0]"')[0]
+        version = clause.get_version_range()
+        self.assertEqual("1.2", version.floor)
+        self.assertEqual("2.0", version.ceiling)
+        self.assertFalse(version.floor_inclusive)
+        self.assertTrue(version.ceiling_inclusive)
+        self.assertEqual("(1.2,2.0]", str(version))
+
+        version = VersionRange.from_string("3.1")
+        self.assertEqual("3.1", version.floor)
+        self.assertEqual(None, version.ceiling)
+        self.assertEqual(None, parse_clauses("org.a")[0].get_version_range())
+
+    def test_includes(self):
+        version = VersionRange.from_string("[1.2,2)")
+        self.assertTrue(version.includes("1.2"))
+        self.assertTrue(version.includes("1.2.0.qualifier"))
+        self.assertTrue(version.includes("1.10"))
+        self.assertFalse(version.includes("1.1.9"))
+        self.assertFalse(version.includes("2.0.0"))
+
+        version = VersionRange.from_string("(1.2,2.0]")
+        self.assertFalse(version.includes("1.2.0"))
+        self.assertTrue(version.includes("1.2.0.a"))
+        self.assertTrue(version.includes("2"))
+        self.assertTrue(VersionRange.from_string("1.0").includes("99"))
+
+    @exception_expected(ManifestException)
+    def test_invalid_version(self):
+        VersionRange.from_string("1.0").includes("1.x")
+
+    @exception_expected(ManifestException)
+    def test_invalid_range(self):
+        VersionRange.from_string("[1.0]")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,17 @@
 import os
+import pickle
+import shutil
+import tempfile
 import unittest
 
+from lxml import etree
+
 from javapackages.metadata.metadata import Metadata, MetadataInvalidException, MetadataLoadingException
 from javapackages.metadata.artifact import MetadataArtifact
 from javapackages.metadata.skippedartifact import MetadataSkippedArtifact
 from javapackages.metadata.dependency import MetadataDependency
+from javapackages.metadata.index import ProvidedArtifactIndex
+from javapackages.common.binding import to_element, FrozenBindingException
 
 from test.misc import exception_expected
 
@@ -242,6 +249,116 @@ class TestDepmap(unittest.TestCase):
                                                 "maven-idea-plugin",
                                                 classifier="test-jar") in skipped)
 
+    @depmapfile("depmap_new_compat.xml")
+    def test_index_provided(self, d):
+        index = ProvidedArtifactIndex(d.get_provided_artifacts())
+        dep = MetadataDependency("org.apache.maven.plugins",
+                                 "maven-idea-plugin")
+        for compat in ["1.4", "1.5"]:
+            dep.resolvedVersion = compat
+            self.assertEqual(dep.is_provided_by(index), (True, "1.4"))
+        dep.resolvedVersion = "1.6"
+        self.assertEqual(dep.is_provided_by(index), (False, None))
+        dep.extension = "war"
+        self.assertEqual(dep.is_provided_by(index), (False, None))
+
+    def test_index_compat_order(self):
+        compat = MetadataArtifact("g", "a", version="1", compatVersions=set(["1"]))
+        plain = MetadataArtifact("g", "a", version="2")
+        index = ProvidedArtifactIndex([compat, plain])
+        self.assertEqual(MetadataDependency("g", "a").is_provided_by(index),
+                         (True, "2"))
+        self.assertEqual(MetadataDependency("g", "a", resolvedVersion="1")
+                         .is_provided_by(index), (True, "1"))
+        self.assertEqual(index.get_artifact("g", "a"), compat)
+        self.assertEqual(index.get_artifact("g", "a", "pom"), None)
+
+    @depmapfile("depmap_skipped.xml")
+    def test_index_skipped(self, d):
+        index = ProvidedArtifactIndex(skipped_artifacts=d.get_skipped_artifacts())
+        dep = MetadataDependency("org.apache.maven.plugins",
+                                 "maven-idea-plugin")
+        self.assertTrue(dep.is_skipped(index))
+        dep.classifier = "test-jar"
+        self.assertTrue(dep.is_skipped(index))
+        dep.classifier = "sources"
+        self.assertFalse(dep.is_skipped(index))
+
+    def test_iter_artifacts(self):
+        main_dir = os.path.dirname(os.path.realpath(__file__))
+        for fname in ["depmap_new_compat.xml",
+                      "depmap_new_versioned_compressed.xml.gz"]:
+            path = os.path.join(main_dir, "data", fname)
+            self.assertEqual(list(Metadata.iter_artifacts_from_file(path)),
+                             Metadata.create_from_file(path).artifacts)
+
+    @exception_expected(MetadataInvalidException)
+    def test_iter_artifacts_nover(self):
+        main_dir = os.path.dirname(os.path.realpath(__file__))
+        path = os.path.join(main_dir, "data", "depmap_invalid_nover.xml")
+        list(Metadata.iter_artifacts_from_file(path))
+
+    def test_empty_artifacts(self):
+        content = ('<metadata xmlns="http://fedorahosted.org/xmvn/METADATA/2.3.0">'
+                   '<uuid>a</uuid><artifacts/></metadata>')
+        workdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(workdir, "empty.xml")
+            with open(path, "w") as f:
+                f.write(content)
+            metadata = Metadata.create_from_file(path)
+            self.assertEqual([], list(Metadata.iter_artifacts_from_file(path)))
+        finally:
+            shutil.rmtree(workdir)
+        self.assertTrue("artifacts" in metadata)
+        self.assertEqual([], metadata.artifacts)
+        self.assertEqual(Metadata.create_from_string(content), metadata)
+
+    def test_binding_slots(self):
+        dep = MetadataDependency("g", "a", requestedVersion="1")
+        self.assertFalse(hasattr(dep, "__dict__"))
+        self.assertTrue("artifactId" in dep)
+        self.assertFalse("extension" in dep)
+        self.assertEqual(dep.extension, "jar")
+        self.assertEqual(dep.values["requestedVersion"], "1")
+        dep.classifier = "tests"
+        self.assertTrue("classifier" in dep)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            loaded = pickle.loads(pickle.dumps(dep, protocol))
+            self.assertEqual(dep, loaded)
+            self.assertTrue("classifier" in loaded)
+            self.assertFalse("extension" in loaded)
+        self.assertEqual(dep, dep.copy())
+
+    @depmapfile("depmap_namespace_requires.xml")
+    def test_freeze(self, d):
+        d.freeze()
+        artifact = d.artifacts[0]
+        self.assertTrue(artifact.is_frozen())
+        self.assertRaises(FrozenBindingException, setattr, artifact,
+                          "version", "2")
+        for dep in artifact.dependencies:
+            self.assertRaises(FrozenBindingException, setattr, dep,
+                              "resolvedVersion", "2")
+        copy = d.copy()
+        self.assertEqual(d, copy)
+        self.assertFalse(copy.artifacts[0].is_frozen())
+        copy.artifacts[0].version = "2"
+        self.assertEqual("2.2", d.artifacts[0].version)
+
+    @depmapfile("depmap_namespace_requires.xml")
+    def test_serialize_roundtrip(self, d):
+        data = etree.tostring(to_element(d))
+        self.assertEqual(d, Metadata.create_from_string(data))
+
+    @exception_expected(MetadataLoadingException)
+    def test_duplicate_element(self):
+        Metadata.create_from_string("""
+            <metadata xmlns="http://fedorahosted.org/xmvn/METADATA/2.3.0">
+              <uuid>a</uuid>
+              <uuid>b</uuid>
+            </metadata>""")
+
     @exception_expected(MetadataLoadingException)
     @depmapfile("depmap_incorrect_provides.xml")
     def test_incorrect_provides(self, d):
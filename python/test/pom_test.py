@@ -1,7 +1,10 @@
 import os
+import shutil
+import tempfile
 import unittest
 import lxml
 
+import javapackages.maven.pomreader as pomreader
 from javapackages.maven.pom import POM, PomLoadingException
 
 from test.misc import exception_expected
@@ -76,6 +79,57 @@ class TestPOM(unittest.TestCase):
     def test_ivy_module(self, p):
         self.assertEqual(p.groupId, "org.apache")
 
+    @pomfile("xmlrpc-nons.pom")
+    def test_no_xmlns_dependencies(self, p):
+        main_dir = os.path.dirname(os.path.realpath(__file__))
+        ns = POM(os.path.join(main_dir, "data", "xmlrpc.pom"))
+        self.assertEqual([d.artifactId for d in p.dependencies],
+                         [d.artifactId for d in ns.dependencies])
+        self.assertEqual(p.properties, ns.properties)
+
+    @pomfile("commons-lang.pom")
+    def test_fresh_dependencies(self, p):
+        deps = p.dependencies
+        self.assertTrue(deps)
+        deps[0].version = "changed"
+        self.assertNotEqual(p.dependencies[0].version, "changed")
+
+    def test_document_cache(self):
+        main_dir = os.path.dirname(os.path.realpath(__file__))
+        workdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(workdir, "pom.xml")
+            shutil.copy(os.path.join(main_dir, "data", "commons-lang.pom"),
+                        path)
+            self.assertTrue(POM(path)._doc is POM(path)._doc)
+
+            with open(os.path.join(main_dir, "data", "xmlrpc.pom")) as src:
+                content = src.read()
+            with open(path, "w") as dst:
+                dst.write(content)
+            os.utime(path, (0, 0))
+            self.assertEqual(POM(path).artifactId, "xmlrpc")
+        finally:
+            shutil.rmtree(workdir)
+
+    def test_document_cache_bounded(self):
+        main_dir = os.path.dirname(os.path.realpath(__file__))
+        old_max = pomreader._DOCUMENTS_MAX
+        pomreader._DOCUMENTS_MAX = 2
+        try:
+            for name in ("commons-lang.pom", "xmlrpc.pom", "junit-comments.pom"):
+                pomreader.load(os.path.join(main_dir, "data", name))
+                self.assertTrue(len(pomreader._documents) <= 2)
+        finally:
+            pomreader._DOCUMENTS_MAX = old_max
+
+    def test_find_parts_skips_root(self):
+        doc = lxml.etree.ElementTree(lxml.etree.fromstring(
+            "<project><artifactId>a</artifactId><parent>"
+            "<project>p</project></parent></project>"))
+        parts = pomreader.find_parts(doc, {"project": "", "artifactId": ""})
+        self.assertEqual({"project": "p", "artifactId": "a"}, parts)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,13 @@
 import os
+import shutil
+import stat
+import tempfile
 import unittest
 
-from javapackages.common.util import get_buildroot_files
+from optparse import OptionParser
+
+from javapackages.common.util import (get_buildroot_files, find_executable,
+                                      command_exists, read_batch)
 
 
 class TestUtil(unittest.TestCase):
@@ -13,6 +19,44 @@ class TestUtil(unittest.TestCase):
         self.assertEqual(1, len(files))
         self.assertTrue(next(iter(files)).endswith("/usr/share/java/regular.jar"))
 
+    def test_find_executable(self):
+        workdir = tempfile.mkdtemp()
+        old_path = os.environ.get("PATH")
+        try:
+            tool = os.path.join(workdir, "some-tool")
+            os.environ["PATH"] = os.pathsep.join(["/nonexistent", workdir])
+            self.assertEqual(None, find_executable("some-tool"))
+            with open(tool, "w") as f:
+                f.write("#!/bin/sh\n")
+            # negative result is remembered
+            self.assertFalse(command_exists("some-tool"))
+            os.environ["PATH"] = os.pathsep.join([workdir, "/nonexistent"])
+            # not executable
+            self.assertEqual(None, find_executable("some-tool"))
+            os.chmod(tool, stat.S_IRWXU)
+            os.environ["PATH"] = workdir
+            self.assertEqual(tool, find_executable("some-tool"))
+            self.assertEqual(tool, find_executable(tool))
+            self.assertTrue(command_exists("some-tool"))
+        finally:
+            os.environ["PATH"] = old_path
+            shutil.rmtree(workdir)
+
+    def test_read_batch(self):
+        parser = OptionParser()
+        parser.add_option("-a")
+        parser.add_option("--batch")
+        workdir = tempfile.mkdtemp()
+        try:
+            batch = os.path.join(workdir, "batch")
+            with open(batch, "w") as f:
+                f.write("# comment\n\n-a 'x y' z\nw\n")
+            invocations = read_batch(parser, batch)
+        finally:
+            shutil.rmtree(workdir)
+        self.assertEqual([("x y", ["z"]), (None, ["w"])],
+                         [(options.a, args) for options, args in invocations])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,231 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+import javapackages.xmvn.xmvn_resolve as xmvn_resolve
+from javapackages.xmvn.xmvn_resolve import (XMvnResolve, ResolutionCache,
+                                            ResolutionRequest, ResolverSession,
+                                            get_repository_fingerprint)
+
+
+RESULTS = """<results>
+  <result>
+    <artifactPath>{path}</artifactPath>
+    <compatVersion>1.0</compatVersion>
+  </result>
+  <result/>
+</results>"""
+
+CANNED = """<resolutions>
+  <resolution>
+    <request><artifact><groupId>g</groupId><artifactId>a</artifactId></artifact></request>
+    <result><artifactPath>/a.jar</artifactPath></result>
+  </resolution>
+  <resolution>
+    <request><artifact><groupId>g</groupId><artifactId>b</artifactId><version>1</version></artifact></request>
+    <result><artifactPath>/b.jar</artifactPath></result>
+  </resolution>
+</resolutions>"""
+
+
+class TestResolutionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.repodir = os.path.join(self.workdir, "maven-metadata")
+        os.makedirs(self.repodir)
+        self.cachepath = os.path.join(self.workdir, "cache", "resolve.cache")
+        self.requests = [ResolutionRequest("g", "foo"),
+                         ResolutionRequest("g", "bar", extension="pom")]
+        self.jar = os.path.join(self.workdir, "foo.jar")
+        open(self.jar, "w").close()
+        self.results = XMvnResolve._process_results(
+            RESULTS.format(path=self.jar))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def fingerprint(self):
+        return get_repository_fingerprint([self.repodir])
+
+    def test_roundtrip(self):
+        cache = ResolutionCache(self.cachepath, self.fingerprint())
+        self.assertEqual((False, None), cache.get(self.requests[0]))
+        cache.update(self.requests, self.results)
+        cache.save()
+        cache = ResolutionCache(self.cachepath, self.fingerprint())
+        found, result = cache.get(self.requests[0])
+        self.assertTrue(found)
+        self.assertEqual("1.0", result.compatVersion)
+        self.assertEqual(self.jar, result.artifactPath)
+        # unresolvable artifacts are cached too
+        self.assertEqual((True, None), cache.get(self.requests[1]))
+        self.assertEqual((False, None),
+                         cache.get(ResolutionRequest("g", "foo", version="2")))
+
+    def test_invalidated(self):
+        cache = ResolutionCache(self.cachepath, self.fingerprint())
+        cache.update(self.requests, self.results)
+        cache.save()
+        with open(os.path.join(self.repodir, "new.xml"), "w") as f:
+            f.write("<metadata/>")
+        cache = ResolutionCache(self.cachepath, self.fingerprint())
+        self.assertEqual((False, None), cache.get(self.requests[0]))
+
+    def test_missing_artifact(self):
+        cache = ResolutionCache(self.cachepath, self.fingerprint())
+        cache.update(self.requests, self.results)
+        cache.save()
+        # e.g. temporary effective POM was removed
+        os.remove(self.jar)
+        cache = ResolutionCache(self.cachepath, self.fingerprint())
+        self.assertEqual((False, None), cache.get(self.requests[0]))
+        self.assertEqual((True, None), cache.get(self.requests[1]))
+
+
+class TestProcessRawRequest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        # fake xmvn-resolve counting its invocations
+        self.counter = os.path.join(self.workdir, "calls")
+        results = os.path.join(self.workdir, "results.xml")
+        jar = os.path.join(self.workdir, "foo.jar")
+        open(jar, "w").close()
+        with open(results, "w") as f:
+            f.write(RESULTS.format(path=jar))
+        self.tool = os.path.join(self.workdir, "xmvn-resolve")
+        with open(self.tool, "w") as f:
+            f.write("#!/bin/sh\ncat >/dev/null\necho >>{0}\ncat {1}\n"
+                    .format(self.counter, results))
+        os.chmod(self.tool, stat.S_IRWXU)
+        with open(os.path.join(self.workdir, "javapackages-config.json"),
+                  "w") as f:
+            json.dump({"xmvn-resolve": {"cache": True,
+                                        "cache_dir": self.workdir}}, f)
+        self.old_env = dict(os.environ)
+        os.environ["JAVACONFDIRS"] = self.workdir
+        os.environ.pop("JAVAPACKAGES_XMVN_RESOLVE_TEST", None)
+        self.old_tool = XMvnResolve.tool
+        XMvnResolve.tool = self.tool
+        xmvn_resolve._resolution_caches.clear()
+
+    def tearDown(self):
+        XMvnResolve.tool = self.old_tool
+        os.environ.clear()
+        os.environ.update(self.old_env)
+        xmvn_resolve._resolution_caches.clear()
+        shutil.rmtree(self.workdir)
+
+    def calls(self):
+        with open(self.counter) as f:
+            return len(f.readlines())
+
+    def test_cached(self):
+        requests = [ResolutionRequest("g", "foo"),
+                    ResolutionRequest("g", "bar", extension="pom")]
+        results = XMvnResolve.process_raw_request(requests)
+        self.assertEqual("1.0", results[0].compatVersion)
+        self.assertEqual(None, results[1])
+        self.assertEqual(1, self.calls())
+        # next process reads the results from disk
+        xmvn_resolve._resolution_caches.clear()
+        results = XMvnResolve.process_raw_request(list(reversed(requests)))
+        self.assertEqual(None, results[0])
+        self.assertEqual("1.0", results[1].compatVersion)
+        self.assertEqual(1, self.calls())
+
+    def test_disabled_by_default(self):
+        with open(os.path.join(self.workdir, "javapackages-config.json"),
+                  "w") as f:
+            json.dump({}, f)
+        self.assertEqual(None, xmvn_resolve.get_resolution_cache())
+
+    def test_fingerprint_once(self):
+        cache = xmvn_resolve.get_resolution_cache()
+        old_dirs = xmvn_resolve.repository_dirs
+        xmvn_resolve.repository_dirs = [self.workdir]
+        try:
+            # fingerprint is not recomputed for every request
+            self.assertTrue(cache is xmvn_resolve.get_resolution_cache())
+        finally:
+            xmvn_resolve.repository_dirs = old_dirs
+
+    def test_xmvn_config_fingerprint(self):
+        builddir = os.path.join(self.workdir, "build")
+        os.makedirs(os.path.join(builddir, ".xmvn", "config.d"))
+        fingerprint = get_repository_fingerprint(builddir=builddir)
+        with open(os.path.join(builddir, ".xmvn", "config.d",
+                               "a.xml"), "w") as f:
+            f.write("<configuration/>")
+        self.assertNotEqual(fingerprint,
+                            get_repository_fingerprint(builddir=builddir))
+
+
+class TestResolverSession(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.old_test_env = os.environ.pop("JAVAPACKAGES_XMVN_RESOLVE_TEST",
+                                           None)
+
+    def tearDown(self):
+        if self.old_test_env is not None:
+            os.environ["JAVAPACKAGES_XMVN_RESOLVE_TEST"] = self.old_test_env
+
+    def resolver(self, requests):
+        self.batches.append([r.artifactId for r in requests])
+        return [r.artifactId.upper() for r in requests]
+
+    def test_batch(self):
+        session = ResolverSession(self.resolver)
+        session.submit([ResolutionRequest("g", "a"),
+                        ResolutionRequest("g", "b")])
+        session.submit([ResolutionRequest("g", "a"),
+                        ResolutionRequest("g", "c")])
+        self.assertEqual([], self.batches)
+        results = session.resolve([ResolutionRequest("g", "c"),
+                                   ResolutionRequest("g", "a")])
+        self.assertEqual(["C", "A"], results)
+        self.assertEqual([["a", "b", "c"]], self.batches)
+        # resolved requests are not sent again
+        results = session.resolve([ResolutionRequest("g", "b"),
+                                   ResolutionRequest("g", "d")])
+        self.assertEqual(["B", "D"], results)
+        self.assertEqual([["a", "b", "c"], ["d"]], self.batches)
+
+    def test_test_environment(self):
+        workdir = tempfile.mkdtemp()
+        canned = os.path.join(workdir, "canned")
+        with open(canned, "w") as f:
+            f.write(CANNED)
+        os.environ["JAVAPACKAGES_XMVN_RESOLVE_TEST"] = canned
+        try:
+            session = ResolverSession()
+            session.submit([ResolutionRequest("g", "a"),
+                            ResolutionRequest("g", "b", version="1")])
+            session.flush()
+            # canned results are looked up by request, not by order
+            results = session.resolve([ResolutionRequest("g", "b",
+                                                         version="1"),
+                                       ResolutionRequest("g", "c"),
+                                       ResolutionRequest("g", "a")])
+            self.assertEqual("/b.jar", results[0].artifactPath)
+            self.assertEqual(None, results[1])
+            self.assertEqual("/a.jar", results[2].artifactPath)
+        finally:
+            del os.environ["JAVAPACKAGES_XMVN_RESOLVE_TEST"]
+            shutil.rmtree(workdir)
+
+    def test_nothing_pending(self):
+        session = ResolverSession(self.resolver)
+        session.flush()
+        self.assertEqual([], session.resolve([]))
+        self.assertEqual([], self.batches)
+
+
+if __name__ == '__main__':
+    unittest.main()
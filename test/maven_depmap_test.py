@@ -8,6 +8,7 @@ from test_common import (DIRPATH, mvn_depmap, call_script,
                          prepare_metadata, assertIn)
 from test_rpmbuild import Package
 
+from javapackages.metadata.metadata import Metadata
 from lxml import etree
 from xml_compare import compare_lxml_etree
 
@@ -323,6 +324,34 @@ class TestMavenDepmap(unittest.TestCase):
         self.assertEqual(False, os.path.exists('usr/share/java/testversioned.jar'))
         self.assertEqual(True, os.path.exists('usr/share/java/testversioned-2013.10.jar'))
 
+    def test_versioned_rename(self):
+        jar = 'usr/share/java/versioned2.jar'
+        ino = os.stat(jar).st_ino
+        stdout, stderr, return_value = call_script(os.path.join(DIRPATH, '..',
+            'java-utils', 'maven_depmap.py'),
+                ['.out', 'g:a:1.2', jar, '-r', '1,2', '--report-bytes'])
+        self.assertEqual(return_value, 0, stderr)
+        self.assertEqual(False, os.path.exists(jar))
+        self.assertEqual(ino, os.stat('usr/share/java/versioned2-1.jar').st_ino)
+        self.assertEqual(True, os.path.islink('usr/share/java/versioned2-2.jar'))
+        size = os.path.getsize('usr/share/java/versioned2-1.jar')
+        assertIn(self, "Avoided copying {0} bytes".format(size), stderr)
+
+    def test_versioned_symlink_hardlink(self):
+        os.rename('usr/share/java/versioned.war', 'versioned-target.war')
+        os.symlink(os.path.abspath('versioned-target.war'),
+                   'usr/share/java/versioned.war')
+        stdout, stderr, return_value = call_script(os.path.join(DIRPATH, '..',
+            'java-utils', 'maven_depmap.py'),
+                ['.out', 'g:a:war:1.2.3', 'usr/share/java/versioned.war',
+                 '-r', '2.0.0', '--copy-mode', 'hardlink'])
+        self.assertEqual(return_value, 0, stderr)
+        self.assertEqual(False, os.path.lexists('usr/share/java/versioned.war'))
+        versioned = 'usr/share/java/versioned-2.0.0.war'
+        self.assertEqual(False, os.path.islink(versioned))
+        self.assertEqual(os.stat('versioned-target.war').st_ino,
+                         os.stat(versioned).st_ino)
+
     @mvn_depmap('JPP-alias.pom', 'usr/share/java/commons-io.jar', ['-a', 'a:b'])
     def test_alias_extension(self, stdout, stderr, return_value, depmap):
         self.assertEqual(return_value, 0, stderr)
@@ -330,6 +359,52 @@ class TestMavenDepmap(unittest.TestCase):
                                            depmap)
         self.assertEqual(report, '', report)
 
+    def test_batch(self):
+        scriptpath = os.path.join(DIRPATH, '..', 'java-utils', 'maven_depmap.py')
+        invocations = [['.frag1', 'JPP-bndlib.pom', 'usr/share/java/bndlib.jar'],
+                       ['-a', 'a:b', '.frag1', 'JPP-alias.pom',
+                        'usr/share/java/commons-io.jar'],
+                       ['.frag2', 'JPP-apache-commons-io.pom'],
+                       ['-n', 'ns', '.frag1', 'a:b:12',
+                        'usr/share/java/commons-io.jar']]
+        want_stdout = ''
+        for args in invocations:
+            stdout, stderr, return_value = call_script(scriptpath, args)
+            self.assertEqual(return_value, 0, stderr)
+            want_stdout += stdout
+        want = {}
+        for name in ['.frag1', '.frag2']:
+            want[name] = self.read_artifacts(name)
+            os.remove(name)
+
+        batch = '\n'.join([' '.join(args) for args in invocations])
+        stdout, stderr, return_value = call_script(scriptpath,
+                                                   ['--batch', '-'],
+                                                   stdin=batch)
+        self.assertEqual(return_value, 0, stderr)
+        self.assertEqual(want_stdout, stdout)
+        for name in ['.frag1', '.frag2']:
+            self.assertEqual(want[name], self.read_artifacts(name))
+
+    def read_artifacts(self, path):
+        # metadata written in one go don't contain default extensions of
+        # artifacts which were read back in between separate invocations
+        metadata = Metadata.create_from_file(path)
+        return [(str(a), a.namespace, a.path, a.compatVersions,
+                 sorted([str(x) for x in a.aliases]), dict(a.properties))
+                for a in metadata.artifacts]
+
+    def test_batch_failure(self):
+        scriptpath = os.path.join(DIRPATH, '..', 'java-utils', 'maven_depmap.py')
+        batch = ('.frag1 JPP-bndlib.pom usr/share/java/bndlib.jar\n'
+                 '.frag1 JPP-commons-io.pom\n')
+        stdout, stderr, return_value = call_script(scriptpath,
+                                                   ['--batch', '-'],
+                                                   stdin=batch)
+        self.assertNotEqual(return_value, 0)
+        # partial metadata are not written
+        self.assertFalse(os.path.exists('.frag1'))
+
     def test_missing_jar(self):
         p = Package('test')
         p.append_to_prep("%add_maven_depmap g:a:1 this/file/doesnt/exist.jar")
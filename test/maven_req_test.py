@@ -172,6 +172,20 @@ class TestMavenReq(unittest.TestCase):
                 "mvn(org.apache.maven:maven-project)")
         self.assertEqual(set(want), set(sout))
 
+    @mavenreq(["require_multi/buildroot/usr/share/maven-metadata/require.xml"], javaconfdirs=['daemon'])
+    def test_daemon(self, stdout, stderr, return_value):
+        self.assertEqual(return_value, 0, stderr)
+        sout = [x for x in stdout.split('\n') if x]
+        want = ("javapackages-tools", "ns-mvn(org.codehaus.plexus:plexus-ant-factory)",
+                "ns-mvn(codehaus:plexus-utils) = 1.2", "java-headless",
+                "mvn(org.apache.maven.wagon:wagon-provider-api::test-jar:)")
+        self.assertEqual(set(want), set(sout))
+
+    @mavenreq(["require-java-fail/buildroot/usr/share/maven-metadata/require.xml"], javaconfdirs=['daemon'])
+    def test_daemon_fail(self, stdout, stderr, return_value):
+        self.assertNotEqual(return_value, 0)
+        self.assertEqual(True, "ValueError: Unknown Java version 1.4.2" in stderr)
+
     @mavenreq(["require_multi/buildroot/usr/share/maven-metadata/require.xml"], javaconfdirs=['filtered'])
     def test_dep_filtering(self, stdout, stderr, return_value):
         self.assertEqual(return_value, 0, stderr)
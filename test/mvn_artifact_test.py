@@ -188,5 +188,33 @@ class TestMvnArtifact(unittest.TestCase):
         report = self.check_result(inspect.currentframe().f_code.co_name)
         self.assertEqual(report, '', report)
 
+    def test_batch(self):
+        scriptpath = os.path.join(DIRPATH, '..', 'java-utils', 'mvn_artifact.py')
+        invocations = [['args4j.pom', 'maven-artifact.jar'],
+                       ['-Dfoo=bar', 'a:b:war:javadoc:12', 'test-javadoc.war'],
+                       ['merge_sections/child/child/pom.xml']]
+        for args in invocations:
+            (stdout, stderr, return_value) = call_script(scriptpath, args)
+            self.assertEqual(return_value, 0, stderr)
+        want = etree.parse(".xmvn-reactor").getroot()
+        os.remove('.xmvn-reactor')
+
+        batch = "# comment\n\n" + "\n".join([" ".join(args)
+                                               for args in invocations])
+        (stdout, stderr, return_value) = call_script(scriptpath,
+                                                     ['--batch', '-'],
+                                                     stdin=batch)
+        self.assertEqual(return_value, 0, stderr)
+        got = etree.parse(".xmvn-reactor").getroot()
+        report = compare_lxml_etree(got, want, unordered=['dependencies'])
+        self.assertEqual(report, '', report)
+
+    def test_batch_args(self):
+        scriptpath = os.path.join(DIRPATH, '..', 'java-utils', 'mvn_artifact.py')
+        (stdout, stderr, return_value) = call_script(scriptpath,
+                                                     ['--batch', '-', 'a.pom'])
+        self.assertNotEqual(return_value, 0)
+        self.assertFalse(os.path.exists('.xmvn-reactor'))
+
 if __name__ == '__main__':
     unittest.main()